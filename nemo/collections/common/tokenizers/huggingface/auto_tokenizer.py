@@ -327,6 +327,22 @@ class AutoTokenizer(TokenizerSpec):
         ids = self.tokens_to_ids(tokens)
         return ids
 
+    def text_to_ids_batch(self, texts):
+        """
+        Converts a list of texts to token IDs with a single call into the HuggingFace tokenizer.
+
+        Args:
+            texts (List[str]): Input texts to be converted to IDs.
+
+        Returns:
+            List[List[int]]: Token IDs for each input text, matching `text_to_ids` applied element-wise.
+        """
+        if len(texts) == 0:
+            return []
+        if self.include_special_tokens:
+            return self.tokenizer(texts).input_ids
+        return self.tokenizer(texts, add_special_tokens=False).input_ids
+
     def apply_chat_template(self, *args, **kwargs):
         """Appies chat template and tokenizes results"""
         return self.tokenizer.apply_chat_template(*args, **kwargs)
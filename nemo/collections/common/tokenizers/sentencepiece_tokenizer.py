@@ -161,6 +161,22 @@ class SentencePieceTokenizer(TokenizerSpec, ChatTemplateMixin):
         else:
             raise ValueError(f"Expected either str or list input, but got {type(text)}")
 
+    def text_to_ids_batch(self, texts):
+        """Converts a list of strings to token IDs.
+
+        Plain (non-legacy) models encode the whole list with a single SentencePiece call; legacy special-token
+        handling and extra-space handling fall back to per-string `text_to_ids`.
+
+        Args:
+            texts: A list of input strings.
+
+        Returns:
+            A list of token ID lists, one per input string.
+        """
+        if self.legacy or (self.removed_extra_spaces and not self.ignore_extra_whitespaces):
+            return super().text_to_ids_batch(texts)
+        return self.tokenizer.encode_as_ids(list(texts))
+
     def _text_to_ids(self, text, sample_alpha=None):
         """Internal method to convert text to token IDs, handling optional sampling and special token logic.
 
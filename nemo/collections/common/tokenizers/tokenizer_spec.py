@@ -54,6 +54,10 @@ class TokenizerSpec(ABC):
         """Converts token IDs back to text."""
         pass
 
+    def text_to_ids_batch(self, texts: List[str]) -> List[List[int]]:
+        """Converts a list of texts to token IDs. Override to use a native batched implementation."""
+        return [self.text_to_ids(text) for text in texts]
+
     def add_special_tokens(self, special_tokens: List[str]):
         """Adds special tokens (eos, pad, cls...) to vocab."""
         raise NotImplementedError("To be implemented")
@@ -14,6 +14,7 @@
 
 import copy
 
+import numpy as np
 import torch
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
@@ -335,6 +336,10 @@ class GPTSFTChatDataset(GPTSFTDataset):
         id2 = self.tokenizer.text_to_ids(PREFIX_STR)
         self.num_turn_start_tokens = len(id1) - len(id2)
 
+    def __getitems__(self, indices):
+        # conversations are tokenized turn by turn in `preprocess`, so batch tokenization does not apply
+        return [self[idx] for idx in indices]
+
     def _process_example(self, example):
         """
         Create an example by concatenating text and answer.
@@ -359,19 +364,20 @@ class GPTSFTChatDataset(GPTSFTDataset):
         return result
 
     def collate_fn(self, batch):
-        input_ids = [item['input_ids'][:-1].tolist() for item in batch]
-        labels = [item['input_ids'][1:].tolist() for item in batch]
-        contexts = [item['context_ids'].tolist() for item in batch]
-        answers = [item['answer_ids'].tolist() for item in batch]
-        loss_mask = [item['mask'][1:].tolist() for item in batch]
+        input_ids = [item['input_ids'] for item in batch]
+        contexts = [item['context_ids'] for item in batch]
+        answers = [item['answer_ids'] for item in batch]
+        loss_mask = [item['mask'] for item in batch]
         metadata = [item['metadata'] for item in batch]
 
-        max_length = max(max([len(x) for x in input_ids]), max([len(x) for x in contexts]) + self.tokens_to_generate)
+        max_length = max(
+            max([len(x) - 1 for x in input_ids]), max([len(x) for x in contexts]) + self.tokens_to_generate
+        )
         if max_length > self.max_seq_length:
             # truncate the sequences if it is longer than max_seq_length
-            input_ids = [x[: self.max_seq_length] for x in input_ids]
-            labels = [x[: self.max_seq_length] for x in labels]
-            loss_mask = [x[: self.max_seq_length] for x in loss_mask]
+            # (input_ids and mask are not shifted yet, so they keep one extra position)
+            input_ids = [x[: self.max_seq_length + 1] for x in input_ids]
+            loss_mask = [x[: self.max_seq_length + 1] for x in loss_mask]
             contexts = [x[: self.max_seq_length] for x in contexts]
             answers = [x[: self.max_seq_length] for x in answers]
 
@@ -383,18 +389,13 @@ class GPTSFTChatDataset(GPTSFTDataset):
         assert max_length <= self.max_seq_length
 
         if not self.get_attention_mask_from_fusion:
-            attention_mask = [self._create_attention_mask(max_length) for _ in batch]
-            attention_mask = torch.stack(attention_mask)
-        position_ids = [list(range(max_length)) for _ in batch]
-        position_ids = torch.LongTensor(position_ids)
-        input_ids = torch.LongTensor(
-            self._collate_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
-        )
-        labels = torch.LongTensor(self._collate_item(labels, max_length=max_length, pad_id=self.tokenizer.eos_id))
-        loss_mask = torch.LongTensor(self._collate_item(loss_mask, max_length=max_length, pad_id=0))
+            attention_mask = self._create_batch_attention_mask(len(batch), max_length)
+        position_ids = torch.arange(max_length, dtype=torch.int32).repeat(len(batch), 1)
+        input_ids, labels = self._collate_shifted_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
+        _, loss_mask = self._collate_shifted_item(loss_mask, max_length=max_length, pad_id=0, dtype=np.uint8)
         context_lengths = torch.LongTensor([len(x) for x in contexts])
-        contexts = torch.LongTensor(self._collate_item(contexts, max_length=max_length, pad_id=self.tokenizer.eos_id))
-        answers = torch.LongTensor(self._collate_item(answers, max_length=max_length, pad_id=self.tokenizer.eos_id))
+        contexts = self._collate_item(contexts, max_length=max_length, pad_id=self.tokenizer.eos_id)
+        answers = self._collate_item(answers, max_length=max_length, pad_id=self.tokenizer.eos_id)
 
         processed_batch = {
             'tokens': input_ids,
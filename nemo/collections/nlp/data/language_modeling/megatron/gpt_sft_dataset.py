@@ -15,8 +15,10 @@
 # flake8: noqa
 # pylint: skip-file
 
+import hashlib
 import json
 import math
+import os
 import re
 from typing import List, Mapping, Optional
 
@@ -30,9 +32,14 @@ from datasets import load_dataset
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
 from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import get_samples_mapping
-from nemo.collections.nlp.data.language_modeling.text_memmap_dataset import JSONLMemMapDataset, OnlineSampleMapping
+from nemo.collections.nlp.data.language_modeling.text_memmap_dataset import (
+    JSONLMemMapDataset,
+    OnlineSampleMapping,
+    _index_fn,
+    _lightning_prepare_data,
+)
 from nemo.core.classes import Dataset
-from nemo.utils import logging
+from nemo.utils import AppState, logging
 
 __all__ = ['GPTSFTDataset']
 
@@ -69,6 +76,7 @@ class GPTSFTDataset(Dataset):
         ceil_to_power_2: bool = False,
         get_attention_mask_from_fusion: bool = False,
         sanity_check_dist_workers: bool = True,
+        pretokenize: bool = False,
     ):
         """
         file_path: Path to a JSONL GPT supervised fine-tuning dataset. Data is formatted as multiple JSON lines with each line formatted as follows. {'input': 'John von Neumann\nVon Neumann made fundamental contributions .... Q: What did the math of artificial viscosity do?', 'output': 'smoothed the shock transition without sacrificing basic physics'}
@@ -95,6 +103,7 @@ class GPTSFTDataset(Dataset):
         is_test: Whether this dataset is the test split.
         output_original_text (bool): if true, will keep the original text in the output alongside the tokenized ids.
         sanity_check_dist_workers (bool): if true, will run sanity check across workers when making mapping.
+        pretokenize (bool): if true, tokenize the whole dataset once and cache the token ids as memory-mapped files next to the index mapping, so that `__getitem__` does not run the tokenizer.
         """
         self.tokenizer = tokenizer
         self.file_path = file_path
@@ -124,6 +133,10 @@ class GPTSFTDataset(Dataset):
         self.ceil_to_power_2 = ceil_to_power_2
         self.get_attention_mask_from_fusion = get_attention_mask_from_fusion
         self.sanity_check_dist_workers = sanity_check_dist_workers
+        self.pretokenize = pretokenize
+        # token ids of the constant `<template>` pieces of prompt_template, filled lazily
+        self._template_ids_cache = {}
+        self._attention_mask_cache = None
 
         if special_tokens is None:
             self.special_tokens = {
@@ -141,6 +154,9 @@ class GPTSFTDataset(Dataset):
         # Validate prompt template
         self._maybe_validate_prompt_template()
 
+        if self.pretokenize:
+            self._build_pretokenized_cache()
+
         # Will be None after this call if `max_num_samples` is None
         self._build_samples_mapping()
 
@@ -184,6 +200,147 @@ class GPTSFTDataset(Dataset):
             self.prompt_template_keys
         ), f'truncation_fields {self.truncation_fields} must in {self.prompt_template_keys}'
 
+        self._build_template_plan()
+
+    def _build_template_plan(self):
+        """
+        Split prompt_template once into the pieces used by `_separate_template`.
+        Each entry of `self._template_plan` is `(left_spaces, literal, value_idx)`, where `value_idx` points into
+        prompt_template_keys for placeholders and is None for literal template pieces.
+        """
+        placeholders = [f'{{{k}}}' for k in self.prompt_template_keys]
+        # placeholder to index of its value (and key)
+        ph_to_idx = {ph: i for i, ph in enumerate(placeholders)}
+
+        # separate prompt_template based on '<space>{placeholder}'
+        # examples:
+        #   self.prompt_template = "Context:{context}  Passage: {passage}\n\nQuestion:{question} {label}"
+        #   template_with_placeholder_separated = ['Context:', '{context}', '  Passage:', ' {passage}', '\n\nQuestion:', '{question}', ' {label}']
+        template_with_placeholder_separated = re.split('( *?{.+?})', self.prompt_template)
+        template_with_placeholder_separated = [s for s in template_with_placeholder_separated if len(s) > 0]
+
+        # remove space if we have leading space and tokenizer is not space_sensitive
+        # space_sensitive = True : tokenizer.text_to_tokens('A{num_spaces}B') = tokenizer.text_to_tokens('A') + tokenizer.text_to_tokens('{num_spaces}B')
+        # space_sensitive = False: tokenizer.text_to_tokens('A{num_spaces}B') = tokenizer.text_to_tokens('A') + tokenizer.text_to_tokens('{num_spaces-1}B')
+        space_sensitive = getattr(self.tokenizer, 'space_sensitive', False)
+        template_with_space_reduced = [
+            s[1:] if not space_sensitive and s[0] == ' ' else s for s in template_with_placeholder_separated
+        ]
+
+        self._template_plan, self._template_plan_keys = [], []
+        for t in template_with_space_reduced:
+            placeholder = t.lstrip(' ')
+            left_spaces = ' ' * (len(t) - len(placeholder))
+            value_idx = ph_to_idx.get(placeholder)
+            self._template_plan.append((left_spaces, placeholder, value_idx))
+            self._template_plan_keys.append(
+                self.prompt_template_keys[value_idx] if value_idx is not None else '<template>'
+            )
+        # positions of the template pieces that are truncated first when an example is too long
+        self._truncation_field_positions = [
+            i for i, key in enumerate(self._template_plan_keys) if key in self.truncation_fields
+        ]
+
+    def _tokenizer_fingerprint(self):
+        """
+        Hash identifying the tokenizer: its model (sentencepiece proto, HF tokenizer json or vocab) together with
+        the settings of the NeMo wrapper, e.g. `legacy`, `include_special_tokens` and the added special tokens.
+        The class name and vocab size alone are not enough, many different 32k sentencepiece models exist.
+        """
+        inner = getattr(self.tokenizer, 'tokenizer', None)
+        if hasattr(inner, 'serialized_model_proto'):
+            # sentencepiece
+            model = inner.serialized_model_proto()
+        elif hasattr(inner, 'backend_tokenizer'):
+            # HF fast tokenizer, the json includes the added tokens and the normalizer / pre-tokenizer settings
+            model = inner.backend_tokenizer.to_str().encode('utf-8')
+        elif hasattr(inner, 'get_vocab'):
+            model = json.dumps(sorted(inner.get_vocab().items())).encode('utf-8')
+        else:
+            model = json.dumps(self.tokenizer.ids_to_tokens(list(range(self.tokenizer.vocab_size)))).encode('utf-8')
+
+        settings = {
+            key: value
+            for key, value in sorted(vars(self.tokenizer).items())
+            if isinstance(value, (bool, int, float, str, type(None)))
+        }
+        settings['special_token_to_id'] = sorted(getattr(self.tokenizer, 'special_token_to_id', {}).items())
+        fingerprint = hashlib.md5(model)
+        fingerprint.update(json.dumps(settings, default=str).encode('utf-8'))
+        return fingerprint.hexdigest()
+
+    def _pretokenized_cache_prefix(self):
+        """
+        Base name of the pretokenized cache files, keyed by everything that affects the template ids: the tokenizer,
+        the template settings and the size and modification time of the data file (so an edited file is re-tokenized).
+        """
+        file_stat = os.stat(self.file_path)
+        cache_key = json.dumps(
+            [
+                self.tokenizer.name,
+                self.tokenizer.vocab_size,
+                self._tokenizer_fingerprint(),
+                getattr(self.tokenizer, 'space_sensitive', False),
+                self.prompt_template,
+                self.label_key,
+                self.is_test,
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+            ]
+        )
+        cache_hash = hashlib.md5(cache_key.encode('utf-8')).hexdigest()
+        return f'{_index_fn(self.file_path, self.index_mapping_dir)}.{cache_hash}'
+
+    def _write_pretokenized_cache(self, cache_prefix, chunk_size=1024):
+        """Tokenize all examples and save the flat token ids and the segment offsets as `.npy` files."""
+        if os.path.exists(cache_prefix + '.tokens.npy') and os.path.exists(cache_prefix + '.offsets.npy'):
+            return
+
+        logging.info(f'Pretokenizing {self.file_path} into {cache_prefix}.{{tokens,offsets}}.npy')
+        tokens, lengths = [], []
+        for start in range(0, len(self.indexed_dataset), chunk_size):
+            template_strings = []
+            for idx in range(start, min(start + chunk_size, len(self.indexed_dataset))):
+                template_strings.extend(self._get_template_strings(self.indexed_dataset[idx])[0])
+            chunk_ids = self.tokenizer.text_to_ids_batch(template_strings)
+            lengths.extend(len(ids) for ids in chunk_ids)
+            tokens.append(np.fromiter((i for ids in chunk_ids for i in ids), dtype=np.uint32))
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # write to temporary files first so that a partially written cache is never picked up
+        tokens = np.concatenate(tokens) if tokens else np.empty(0, dtype=np.uint32)
+        for suffix, array in (('.tokens.npy', tokens), ('.offsets.npy', offsets)):
+            with open(cache_prefix + suffix + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(cache_prefix + suffix + '.tmp', cache_prefix + suffix)
+
+    def _build_pretokenized_cache(self):
+        """
+        Tokenize the dataset once and memory-map the result. Every example has the same number of template
+        segments, so the ids of segment `j` of example `i` are `tokens[offsets[i * S + j] : offsets[i * S + j + 1]]`.
+        """
+        cache_prefix = self._pretokenized_cache_prefix()
+        is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+
+        if not is_distributed or torch.distributed.get_rank() == 0:
+            self._write_pretokenized_cache(cache_prefix)
+        if is_distributed and not _lightning_prepare_data():
+            torch.distributed.barrier()
+        if is_distributed and AppState().local_rank == 0:
+            # no-op on a shared filesystem, otherwise creates the cache on every node
+            self._write_pretokenized_cache(cache_prefix)
+        if is_distributed and not _lightning_prepare_data():
+            torch.distributed.barrier()
+
+        self.pretokenized_tokens = np.load(cache_prefix + '.tokens.npy', mmap_mode='r')
+        self.pretokenized_offsets = np.load(cache_prefix + '.offsets.npy', mmap_mode='r')
+
+    def _get_pretokenized_ids(self, idx):
+        num_segments = len(self._template_plan)
+        offsets = self.pretokenized_offsets[idx * num_segments : (idx + 1) * num_segments + 1]
+        return [self.pretokenized_tokens[offsets[j] : offsets[j + 1]].tolist() for j in range(num_segments)]
+
     def _build_samples_mapping(self):
         if self.max_num_samples is not None:
             osm = (
@@ -215,14 +372,36 @@ class GPTSFTDataset(Dataset):
             return len(self.samples_mapping)
 
     def __getitem__(self, idx):
-        if isinstance(idx, np.int64):
-            idx = idx.item()
+        idx, example = self._get_example(idx)
+        if self.pretokenize:
+            return self._process_example(example, template_ids=self._get_pretokenized_ids(idx))
+        return self._process_example(example)
+
+    def __getitems__(self, indices):
+        """
+        Batched `__getitem__` used by the DataLoader fetcher. The template strings of the whole mini-batch are
+        tokenized with a single `text_to_ids_batch` call, which lets fast tokenizers encode the batch in parallel
+        in native code instead of one example at a time.
+        """
+        if self.pretokenize:
+            return [self[idx] for idx in indices]
+        examples = [self._get_example(idx)[1] for idx in indices]
+        template_strings = [self._get_template_strings(example) for example in examples]
+        template_ids = self._tokenize_template_strings_batch(template_strings)
+        return [
+            self._process_example(example, template_ids=ids, template_strings=strings)
+            for example, ids, strings in zip(examples, template_ids, template_strings)
+        ]
+
+    def _get_example(self, idx):
+        """Map a sample index to the index of the raw example in `indexed_dataset` and load that example."""
+        # int() handles python ints and numpy scalars (e.g. np.int64 indices, np.uint32 mapping entries) alike
+        idx = int(idx)
 
         if self.samples_mapping is not None:
             assert idx < len(self.samples_mapping)
             idx, _, _ = self.samples_mapping[idx]
-            if isinstance(idx, np.uint32):
-                idx = idx.item()
+            idx = int(idx)
 
         assert idx < len(self.indexed_dataset)
         # idx may < 0 because we pad_samples_to_global_batch_size, e.g. id = -1
@@ -238,7 +417,7 @@ class GPTSFTDataset(Dataset):
         except Exception as e:
             logging.error(f"Error while loading example {idx} from dataset {self.file_path}")
             raise e
-        return self._process_example(example)
+        return idx, example
 
     def _separate_template(self, prompt_template_values: List[str]):
         """
@@ -263,37 +442,11 @@ class GPTSFTDataset(Dataset):
 
             template_strings_keys = ['<template>', 'context', '<template>', 'question', '<template>', 'label']
         """
-        placeholders = [f'{{{k}}}' for k in self.prompt_template_keys]
-
-        # placeholder to string
-        ph_to_s = {ph: s for ph, s in zip(placeholders, prompt_template_values)}
-        # placeholder to key
-        ph_to_k = {ph: k for ph, k in zip(placeholders, self.prompt_template_keys)}
-
-        # separate prompt_template based on '<space>{placeholder}'
-        # examples:
-        #   self.prompt_template = "Context:{context}  Passage: {passage}\n\nQuestion:{question} {label}"
-        #   template_with_placeholder_separated = ['Context:', '{context}', '  Passage:', ' {passage}', '\n\nQuestion:', '{question}', ' {label}']
-        template_with_placeholder_separated = re.split('( *?{.+?})', self.prompt_template)
-        template_with_placeholder_separated = [s for s in template_with_placeholder_separated if len(s) > 0]
-
-        # remove space if we have leading space and tokenizer is not space_sensitive
-        # space_sensitive = True : tokenizer.text_to_tokens('A{num_spaces}B') = tokenizer.text_to_tokens('A') + tokenizer.text_to_tokens('{num_spaces}B')
-        # space_sensitive = False: tokenizer.text_to_tokens('A{num_spaces}B') = tokenizer.text_to_tokens('A') + tokenizer.text_to_tokens('{num_spaces-1}B')
-        space_sensitive = getattr(self.tokenizer, 'space_sensitive', False)
-        template_with_space_reduced = [
-            s[1:] if not space_sensitive and s[0] == ' ' else s for s in template_with_placeholder_separated
+        template_strings = [
+            left_spaces + (prompt_template_values[value_idx] if value_idx is not None else literal)
+            for left_spaces, literal, value_idx in self._template_plan
         ]
-
-        # convert placeholder to the corresponding string (preserve left spaces) and key
-        template_strings, template_strings_keys = [], []
-        for t in template_with_space_reduced:
-            placeholder = t.lstrip(' ')
-            left_spaces = ' ' * (len(t) - len(placeholder))
-            template_strings.append(left_spaces + ph_to_s.get(placeholder, placeholder))
-            template_strings_keys.append(ph_to_k.get(placeholder, '<template>'))
-
-        return template_strings, template_strings_keys
+        return template_strings, self._template_plan_keys
 
     def _multiple_truncation(self, template_ids: List[List[int]], template_ids_keys: List[str]):
         """
@@ -320,27 +473,23 @@ class GPTSFTDataset(Dataset):
 
         if total_ids > self.max_seq_length:
             truncation_length_total = total_ids - self.max_seq_length
-            num_fields = len(self.truncation_fields)
+            num_fields = len(self._truncation_field_positions)
             if num_fields > 0:
-                # sorted equal divide length to each field
+                # equal divide length to each field, the first fields take the remainder
                 # examples:
-                #   truncation_length_total = 3
-                #   num_fields = 11
-                #   truncation_length_list = [3,4,4]
-                truncation_length_list = [
-                    truncation_length_total // num_fields + (1 if i < truncation_length_total % num_fields else 0)
-                    for i in range(num_fields)[::-1]
-                ]
-
-                for i, (ids, key) in enumerate(zip(template_ids, template_ids_keys)):
-                    if key in self.truncation_fields:
-                        truncation_length = truncation_length_list.pop()
-                        if len(ids) < truncation_length:
-                            logging.warning(f'{key} is not long enough to truncate.')
-                            truncation_length = len(ids)
-
-                        truncation_length_total -= truncation_length
-                        template_ids[i] = self._truncation(ids, len(ids) - truncation_length)
+                #   truncation_length_total = 11
+                #   num_fields = 3
+                #   truncation lengths = [4,4,3]
+                truncation_length_per_field, remainder = divmod(truncation_length_total, num_fields)
+                for field_idx, i in enumerate(self._truncation_field_positions):
+                    ids = template_ids[i]
+                    truncation_length = truncation_length_per_field + (field_idx < remainder)
+                    if len(ids) < truncation_length:
+                        logging.warning(f'{template_ids_keys[i]} is not long enough to truncate.')
+                        truncation_length = len(ids)
+
+                    truncation_length_total -= truncation_length
+                    template_ids[i] = self._truncation(ids, len(ids) - truncation_length)
 
             if truncation_length_total > 0:
                 template_ids_lengths = [len(ids) for ids in template_ids]
@@ -378,12 +527,8 @@ class GPTSFTDataset(Dataset):
         else:
             raise ValueError(f'{self.truncation_method} is not supported')
 
-    def _process_example(self, example):
-        """
-        Create an example by concatenating text and answer.
-        Truncation is carried out when needed, but it is performed only on the prompt side.
-        BOS, EOS, and SEP, are added if specified.
-        """
+    def _get_template_strings(self, example):
+        """Extract the prompt template values of an example and separate them into template strings and keys."""
         prompt_template_values = []
         for c in self.prompt_template_keys:
             try:
@@ -395,28 +540,82 @@ class GPTSFTDataset(Dataset):
                 else:
                     raise e
 
-        template_strings, template_strings_keys = self._separate_template(prompt_template_values)
-        template_ids = [self.tokenizer.text_to_ids(s) for s in template_strings]
+        return self._separate_template(prompt_template_values)
+
+    def _tokenize_template_strings(self, template_strings: List[str], template_strings_keys: List[str]):
+        """Tokenize the template strings of one example with a single batched tokenizer call."""
+        return self._tokenize_template_strings_batch([(template_strings, template_strings_keys)])[0]
+
+    def _tokenize_template_strings_batch(self, batch_template_strings):
+        """
+        Tokenize the (template_strings, template_strings_keys) pairs of several examples with a single batched
+        tokenizer call. The `<template>` pieces are the same for every example, so their ids are served from
+        a cache which is bounded by the number of literal pieces in prompt_template.
+        """
+        batch_template_ids = []
+        missing = []
+        for i, (template_strings, template_strings_keys) in enumerate(batch_template_strings):
+            template_ids = []
+            for j, (s, k) in enumerate(zip(template_strings, template_strings_keys)):
+                ids = self._template_ids_cache.get(s) if k == '<template>' else None
+                if ids is None:
+                    missing.append((i, j))
+                template_ids.append(ids)
+            batch_template_ids.append(template_ids)
+        if missing:
+            missing_ids = self.tokenizer.text_to_ids_batch([batch_template_strings[i][0][j] for i, j in missing])
+            for (i, j), ids in zip(missing, missing_ids):
+                template_strings, template_strings_keys = batch_template_strings[i]
+                if template_strings_keys[j] == '<template>':
+                    self._template_ids_cache[template_strings[j]] = ids
+                batch_template_ids[i][j] = ids
+        return batch_template_ids
+
+    def _process_example(self, example, template_ids=None, template_strings=None):
+        """
+        Create an example by concatenating text and answer.
+        Truncation is carried out when needed, but it is performed only on the prompt side.
+        BOS, EOS, and SEP, are added if specified.
+        `template_ids` may be passed in to skip tokenization, e.g. when loaded from the pretokenized cache,
+        and `template_strings` (the output of `_get_template_strings`) when it was already computed.
+        """
+        if template_strings is None:
+            template_strings = self._get_template_strings(example)
+        template_strings, template_strings_keys = template_strings
+        if template_ids is None:
+            template_ids = self._tokenize_template_strings(template_strings, template_strings_keys)
         context_ids, answer_ids = self._multiple_truncation(template_ids, template_strings_keys)
 
-        if self.virtual_tokens:
-            # (@adithyare) we are going to insert "pad/eos" tokens in the beginning of the text and context
-            # these pad/eos tokens are placeholders for virtual tokens
-            context_ids = [self.tokenizer.eos_id] * self.virtual_tokens + context_ids
+        # input_ids is laid out as [virtual tokens][bos][context][sep][answer][eos] in a single preallocated array,
+        # and context_ids / answer_ids are views into it
+        context_length = self.virtual_tokens + self.add_bos + len(context_ids) + self.add_sep
+        answer_end = context_length + len(answer_ids)
+        input_ids = np.empty(answer_end + self.add_eos, dtype=np.int64)
+
+        # (@adithyare) we are going to insert "pad/eos" tokens in the beginning of the text and context
+        # these pad/eos tokens are placeholders for virtual tokens
+        input_ids[: self.virtual_tokens] = self.tokenizer.eos_id
+        offset = self.virtual_tokens
 
         # Adds bos token in the start
         if self.add_bos:
-            context_ids = [self.tokenizer.bos_id] + context_ids
+            input_ids[offset] = self.tokenizer.bos_id
+            offset += 1
+
+        input_ids[offset : offset + len(context_ids)] = context_ids
 
         # Adds sep token between text/prompt and answer
         if self.add_sep:
-            context_ids = context_ids + [self.sep_id]
+            input_ids[context_length - 1] = self.sep_id
 
-        input_ids = context_ids + answer_ids
+        input_ids[context_length:answer_end] = answer_ids
 
         # Only training need to consider eos token
         if self.add_eos:
-            input_ids = input_ids + [self.tokenizer.eos_id]
+            input_ids[answer_end] = self.tokenizer.eos_id
+
+        context_ids = input_ids[:context_length]
+        answer_ids = input_ids[context_length:answer_end]
 
         # store metadata in dataset, in case user may have keys required in the prediction json files
         metadata = {k: v for k, v in example.items() if k not in self.prompt_template_keys}
@@ -436,11 +635,6 @@ class GPTSFTDataset(Dataset):
 
         return processed_example
 
-    def _maybe_cast_to_list(self, x):
-        if isinstance(x, np.ndarray):
-            return [item.tolist() for item in x]
-        return x
-
     def _ceil_to_nearest(self, n, m):
         if self.ceil_to_power_2:
             # Reccurent Gemma (AKA Griffin) requires seq length to be a power of 2 for parallel scan
@@ -448,23 +642,25 @@ class GPTSFTDataset(Dataset):
         else:
             return (n + m - 1) // m * m
 
-    def _collate_item(self, item, max_length, pad_id):
-        item = self._maybe_cast_to_list(item)
-        # max_length = max([len(x) for x in item]) if item else 0
-        # here [0] should be tokenizer.pad_id
-        item = [x + [pad_id] * (max_length - len(x)) for x in item]
-        return item
+    def _collate_item(self, item, max_length, pad_id, dtype=np.int64):
+        """Pad a list of sequences (lists or numpy arrays) with pad_id into a [len(item), max_length] tensor."""
+        collated = np.full((len(item), max_length), pad_id, dtype=dtype)
+        for i, x in enumerate(item):
+            collated[i, : len(x)] = x
+        return torch.from_numpy(collated)
 
-    def _build_loss_mask(self, processed_example):
-        """Pad input_ids in batch to max batch length while building loss mask"""
-        input_ids = processed_example['input_ids']
-        answer_start_idx = processed_example['answer_start_idx']
+    def _build_batch_loss_mask(self, batch, max_length):
+        """
+        Build the padded uint8 loss mask of the shifted (labels) sequences of a batch, shape [len(batch), max_length].
+        Position `i` is masked in if `i + 1` is a valid token of the example and, with answer_only_loss, part of the answer.
+        """
+        positions = torch.arange(max_length).unsqueeze(0)
+        lengths = torch.LongTensor([len(item['input_ids']) - 1 for item in batch]).unsqueeze(1)
+        loss_mask = positions < lengths
         if self.answer_only_loss:
-            loss_mask = [float(idx >= answer_start_idx) for idx in range(len(input_ids))]
-        else:
-            loss_mask = [1.0] * len(input_ids)
-
-        return loss_mask
+            answer_starts = torch.LongTensor([item['answer_start_idx'] - 1 for item in batch]).unsqueeze(1)
+            loss_mask &= positions >= answer_starts
+        return loss_mask.to(torch.uint8)
 
     @torch.no_grad()
     def _create_attention_mask(self, max_length):
@@ -478,17 +674,35 @@ class GPTSFTDataset(Dataset):
         attention_mask = attention_mask < 0.5
         return attention_mask
 
+    def _create_batch_attention_mask(self, batch_size, max_length):
+        """Create `attention_mask` of shape [batch_size, 1, max_length, max_length].
+        The causal mask is the same for every sample, so a single mask is built (and kept for the next batch
+        of the same length) and copied over the batch dimension. The copy is needed: an expanded view can't be
+        pinned by the DataLoader and would alias the cached mask across batches.
+        """
+        if self._attention_mask_cache is None or self._attention_mask_cache.shape[-1] != max_length:
+            self._attention_mask_cache = self._create_attention_mask(max_length)
+        return self._attention_mask_cache.unsqueeze(0).repeat(batch_size, 1, 1, 1)
+
+    def _collate_shifted_item(self, item, max_length, pad_id, dtype=np.int64):
+        """
+        Pad a list of unshifted sequences once into a [len(item), max_length + 1] buffer and return the
+        `[:, :-1]` (inputs) and `[:, 1:]` (targets) views of it, instead of slicing and padding each shift separately.
+        """
+        collated = self._collate_item(item, max_length=max_length + 1, pad_id=pad_id, dtype=dtype)
+        return collated[:, :-1], collated[:, 1:]
+
     def collate_fn(self, batch):
-        input_ids = [item['input_ids'][:-1] for item in batch]
-        labels = [item['input_ids'][1:] for item in batch]
+        input_ids = [item['input_ids'] for item in batch]
         contexts = [item['context_ids'] for item in batch]
         context_lengths = torch.LongTensor([item['context_length'] for item in batch])
         answers = [item['answer_ids'] for item in batch]
-        loss_mask = [self._build_loss_mask(item)[1:] for item in batch]
         metadata = [item['metadata'] for item in batch]
         token_count = [item['token_count'] for item in batch]
 
-        max_length = max(max([len(x) for x in input_ids]), max([len(x) for x in contexts]) + self.tokens_to_generate)
+        max_length = max(
+            max([len(x) - 1 for x in input_ids]), max([len(x) for x in contexts]) + self.tokens_to_generate
+        )
         # increase max length to nearest multiple of 4 or 8
         if self.pad_to_max_length:
             max_length = self.max_seq_length
@@ -497,17 +711,12 @@ class GPTSFTDataset(Dataset):
         assert max_length <= self.max_seq_length
 
         if not self.get_attention_mask_from_fusion:
-            attention_mask = [self._create_attention_mask(max_length) for _ in batch]
-            attention_mask = torch.stack(attention_mask)
-        position_ids = [list(range(max_length)) for _ in batch]
-        position_ids = torch.LongTensor(position_ids)
-        input_ids = torch.LongTensor(
-            self._collate_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
-        )
-        labels = torch.LongTensor(self._collate_item(labels, max_length=max_length, pad_id=self.tokenizer.eos_id))
-        loss_mask = torch.LongTensor(self._collate_item(loss_mask, max_length=max_length, pad_id=0))
-        contexts = torch.LongTensor(self._collate_item(contexts, max_length=max_length, pad_id=self.tokenizer.eos_id))
-        answers = torch.LongTensor(self._collate_item(answers, max_length=max_length, pad_id=self.tokenizer.eos_id))
+            attention_mask = self._create_batch_attention_mask(len(batch), max_length)
+        position_ids = torch.arange(max_length, dtype=torch.int32).repeat(len(batch), 1)
+        input_ids, labels = self._collate_shifted_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
+        loss_mask = self._build_batch_loss_mask(batch, max_length)
+        contexts = self._collate_item(contexts, max_length=max_length, pad_id=self.tokenizer.eos_id)
+        answers = self._collate_item(answers, max_length=max_length, pad_id=self.tokenizer.eos_id)
 
         processed_batch = {
             'tokens': input_ids,
@@ -575,6 +784,10 @@ class GPTSFTPackedDataset(GPTSFTDataset):
             loss_mask = [0] * len(loss_mask)
         return {'input_ids': input_ids, 'seq_boundaries': seq_boundaries, 'loss_mask': loss_mask}
 
+    def __getitems__(self, indices):
+        # examples are loaded already tokenized, so there is nothing to batch
+        return [self[idx] for idx in indices]
+
     def _load_dataset(self):
         try:
             self.indexed_dataset = np.load(self.file_path, allow_pickle=True)
@@ -617,9 +830,6 @@ class GPTSFTPackedDataset(GPTSFTDataset):
             ]
         )
 
-    def _maybe_cast_to_list(self, x):
-        return [item.tolist() if isinstance(item, np.ndarray) else item for item in x]
-
     def collate_fn(self, batch):
         input_ids = [
             np.concatenate(
@@ -704,14 +914,14 @@ class GPTSFTPackedDataset(GPTSFTDataset):
 
         input_ids = self._collate_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
         labels = self._collate_item(labels, max_length=max_length, pad_id=self.tokenizer.eos_id)
-        loss_mask = self._collate_item(loss_mask, max_length=max_length, pad_id=0)
+        loss_mask = self._collate_item(loss_mask, max_length=max_length, pad_id=0, dtype=np.uint8)
         position_ids = self._collate_item(position_ids, max_length=max_length, pad_id=0)
 
         processed_batch = {
-            'tokens': torch.LongTensor(input_ids),
-            'labels': torch.LongTensor(labels),
-            'loss_mask': torch.LongTensor(loss_mask),
-            'position_ids': torch.LongTensor(position_ids),
+            'tokens': input_ids,
+            'labels': labels,
+            'loss_mask': loss_mask,
+            'position_ids': position_ids,
             'token_count': token_count,
         }
 
@@ -721,11 +931,11 @@ class GPTSFTPackedDataset(GPTSFTDataset):
                 cu_seqlens_unpadded, max_length=max(len(l) for l in cu_seqlens_unpadded) + 1, pad_id=-1
             )
             # Pre-generate `cu_seqlens_argmin` and `max_seqlen` as CPU tensor to avoid device-to-host copies.
-            cu_seqlens = torch.IntTensor(cu_seqlens)
+            cu_seqlens = cu_seqlens.int()
             cu_seqlens_argmin = torch.argmin(cu_seqlens, dim=1, keepdim=True)
             seqlens = cu_seqlens[:, 1:] - cu_seqlens[:, :-1]
             max_seqlen, _ = seqlens.max(dim=1, keepdim=True)
-            cu_seqlens_unpadded = torch.IntTensor(cu_seqlens_unpadded)
+            cu_seqlens_unpadded = cu_seqlens_unpadded.int()
             cu_seqlens_unpadded_argmin = torch.argmin(cu_seqlens_unpadded, dim=1, keepdim=True)
 
             if self.pad_cu_seqlens:
@@ -742,18 +952,17 @@ class GPTSFTPackedDataset(GPTSFTDataset):
                     'attention_mask': torch.LongTensor(
                         [1] * len(input_ids)
                     ),  # no attention mask is needed for packed seq
-                    'cu_seqlens': torch.IntTensor(cu_seqlens),  # cu_seqlens_q must be in dtype torch.int32
+                    'cu_seqlens': cu_seqlens,  # cu_seqlens_q must be in dtype torch.int32
                     'cu_seqlens_argmin': cu_seqlens_argmin,  # only required for perf
                     'max_seqlen': max_seqlen,  # only required for perf
-                    'cu_seqlens_unpadded': torch.IntTensor(cu_seqlens_unpadded),
+                    'cu_seqlens_unpadded': cu_seqlens_unpadded,
                     'cu_seqlens_unpadded_argmin': cu_seqlens_unpadded_argmin,
                 }
             )
         else:
-            attention_mask = [self._create_attention_mask(max_length) for _ in batch]
             processed_batch.update(
                 {
-                    'attention_mask': torch.stack(attention_mask),
+                    'attention_mask': self._create_batch_attention_mask(len(batch), max_length),
                 }
             )
 
@@ -693,13 +693,19 @@ class MegatronBaseModel(NLPModel):
 
         self.log('grad_norm', grad_norm, rank_zero_only=True, batch_size=1)
 
-    def allreduce_gradients(self):
+    def allreduce_gradients(self, params=None):
         """Reduce gradients across data parallel ranks.
         Modified from megatron-lm: https://github.com/NVIDIA/Megatron-LM/blob/d41696840ed0a7edb7e0499eb82a48ae112d9bb3/megatron/model/distributed.py#L188 # pylint: disable=line-too-long
+
+        Args:
+            params: parameters to reduce. Defaults to all model parameters.
         """
+        if params is None:
+            params = self.parameters()
+
         # Bucketize and all-reduce
         buckets = {}
-        for param in self.parameters():
+        for param in params:
             if param.requires_grad and param.grad is not None:
                 tp = param.data.type()
                 if tp not in buckets:
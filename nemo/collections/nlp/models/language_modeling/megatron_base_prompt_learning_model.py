@@ -283,7 +283,7 @@ class MegatronBasePromptLearningModel(MegatronBaseModel, TextGeneration):
 
         if self.first_stage_of_pipeline():
             if self.virtual_prompt_source == VirtualPromptSource.PROMPT_ENCODER:
-                virtual_prompt_params['params'].extend([param for param in self.prompt_encoder.parameters()])
+                virtual_prompt_params['params'].extend(self.prompt_encoder.parameters())
             else:
                 raise ValueError("Optimizer only supports Prompt Encoder.")
 
@@ -302,14 +302,15 @@ class MegatronBasePromptLearningModel(MegatronBaseModel, TextGeneration):
         returns:
             the token embedding for the LM model.
         """
-        # Replace virtual token ids with padding for forward pass through vocab embeddings
-        discrete_token_ids = input_ids.clone()
-        discrete_token_ids[(input_ids >= self.pseudo_token_ids_start)] = self.pad_token_id
-        discrete_token_embeds = self.word_embeddings(discrete_token_ids).clone()
-
         # Find the indicies where virtual tokens should be inserted
         virtual_token_locations = input_ids >= self.pseudo_token_ids_start
 
+        # Replace virtual token ids with padding for forward pass through vocab embeddings.
+        # The embedding output is a fresh tensor whose backward only needs the ids, so the
+        # scatter_ below can write into it directly without a defensive copy.
+        discrete_token_ids = input_ids.masked_fill(virtual_token_locations, self.pad_token_id)
+        discrete_token_embeds = self.word_embeddings(discrete_token_ids)
+
         # If there are no virtual tokens, just return discrete token embeds
         if not virtual_token_locations.any():
             return discrete_token_embeds
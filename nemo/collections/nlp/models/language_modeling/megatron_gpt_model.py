@@ -460,6 +460,9 @@ class MegatronGPTModel(MegatronBaseModel, TextGeneration):
         self.validation_drop_last = data_cfg.get('validation_drop_last', True)
         self.sample_weight = data_cfg.get('sample_weight', 'token')
         self.validation_param_sync_overlap = self.cfg.get('validation_param_sync_overlap', False)
+        # set by fwd_bwd_step while it runs the schedule, to average the micro-batch losses across
+        # data parallel ranks once per step rather than in every micro-batch loss_func
+        self._defer_loss_reduction = False
 
         self.inference_params = None
 
@@ -758,24 +761,28 @@ class MegatronGPTModel(MegatronBaseModel, TextGeneration):
         fwd_bwd_function = get_forward_backward_func()
 
         # TODO @akhattar: add num_micro_batches_with_partial_activation_checkpoints when ready
-        losses_reduced_per_micro_batch = fwd_bwd_function(
-            forward_step_func=self.get_forward_output_and_loss_func(forward_only),
-            data_iterator=self._make_data_iterator_list(dataloader_iter),
-            model=self.model,
-            num_microbatches=get_num_microbatches(),
-            forward_only=forward_only,
-            seq_length=self.cfg.encoder_seq_length,
-            micro_batch_size=self.cfg.micro_batch_size,
-            first_val_step=first_val_step,
-        )
+        self._defer_loss_reduction = True
+        try:
+            losses_reduced_per_micro_batch = fwd_bwd_function(
+                forward_step_func=self.get_forward_output_and_loss_func(forward_only),
+                data_iterator=self._make_data_iterator_list(dataloader_iter),
+                model=self.model,
+                num_microbatches=get_num_microbatches(),
+                forward_only=forward_only,
+                seq_length=self.cfg.encoder_seq_length,
+                micro_batch_size=self.cfg.micro_batch_size,
+                first_val_step=first_val_step,
+            )
+        finally:
+            self._defer_loss_reduction = False
 
         # only the last stages of the pipeline return losses
         if losses_reduced_per_micro_batch:
             if (not forward_only) or self.validation_drop_last:
-                # average loss across micro batches
+                # average loss across micro batches, then across data parallel ranks with a single all-reduce
                 loss_tensors_list = [loss_reduced['avg'] for loss_reduced in losses_reduced_per_micro_batch]
                 loss_tensor = torch.concat(loss_tensors_list)
-                loss_mean = loss_tensor.mean()
+                loss_mean = average_losses_across_data_parallel_group([loss_tensor.mean()])[0]
             else:
                 # Get the total loss since micro batches sizes are not uniform
                 loss_sum_tensors_list = [
@@ -1466,6 +1473,9 @@ class MegatronGPTModel(MegatronBaseModel, TextGeneration):
                         loss_sum_and_ub_size_all_gpu, group=parallel_state.get_data_parallel_group()
                     )
                     return loss_for_ub * cp_size, {'loss_sum_and_ub_size': loss_sum_and_ub_size_all_gpu}
+                elif self._defer_loss_reduction:
+                    # averaged across data parallel ranks once for all micro-batches in fwd_bwd_step
+                    return loss_for_ub * cp_size, {'avg': loss_for_ub.clone().detach().view(1)}
                 else:
                     reduced_loss = average_losses_across_data_parallel_group([loss_for_ub])
                     return loss_for_ub * cp_size, {'avg': reduced_loss}
@@ -1622,10 +1632,11 @@ class MegatronGPTModel(MegatronBaseModel, TextGeneration):
         self.test_step_outputs.clear()  # free memory
 
     def loss_func(self, loss_mask, num_valid_tokens_in_ub, output_tensor):
-        losses = output_tensor.float()
-        loss_mask = loss_mask.view(-1).float()
+        losses = output_tensor.float().view(-1)
+        loss_mask = loss_mask.view(-1).to(losses.dtype)
         # TODO: add nemo version here
-        loss = torch.sum(losses.view(-1) * loss_mask) / num_valid_tokens_in_ub  # sequence level nll
+        # torch.dot does the masked multiply and the sum in a single kernel without materializing losses * loss_mask
+        loss = torch.dot(losses, loss_mask) / num_valid_tokens_in_ub  # sequence level nll
         if parallel_state.get_context_parallel_world_size() > 1:
             torch.distributed.all_reduce(loss, group=parallel_state.get_context_parallel_group())
         return loss
@@ -1779,6 +1790,8 @@ class MegatronGPTModel(MegatronBaseModel, TextGeneration):
             num_workers=self.cfg.data.num_workers,
             pin_memory=True,
             persistent_workers=True if self.cfg.data.num_workers > 0 else False,
+            # number of batches each worker loads ahead, None keeps the PyTorch default (2)
+            prefetch_factor=self.cfg.data.get('prefetch_factor', None) if self.cfg.data.num_workers > 0 else None,
         )
 
     def setup(self, stage=None):
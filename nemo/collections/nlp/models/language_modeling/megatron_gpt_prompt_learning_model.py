@@ -16,6 +16,7 @@
 # pylint: skip-file
 
 import itertools
+import math
 import os
 from functools import partial
 from typing import Any, List, Optional, Union
@@ -98,6 +99,13 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
     using add_ptuned_prompts_to_prompt_table(). Thus, if a user wants to add a
     new virtual prompt via p-tuning, they do not need to retrain on all previous
     tasks. This gives p-tuning the same task flexiblity as prompt-tuning.
+
+    The frozen GPT model takes its activation recompute settings from the
+    activations_checkpoint_granularity/method/num_layers keys of this config.
+    They default to no recompute, 'selective' recomputes only core attention.
+    Setting memory_budget: min (default null) overrides them with full uniform
+    recompute in chunks of sqrt(layers per pipeline stage), trading one extra
+    forward pass through the frozen model for the lowest activation memory.
     """
 
     def __init__(self, cfg: DictConfig, trainer: Trainer):
@@ -135,6 +143,9 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
             frozen_model_cfg.global_batch_size = self.cfg.global_batch_size
             frozen_model_cfg.precision = trainer.precision
             frozen_model_cfg.sequence_parallel = self.cfg.get("sequence_parallel", False)
+            # activations_checkpoint_granularity: selective recomputes the frozen model's core attention instead
+            # of keeping its s^2 attention scores alive for backward, which mostly pays off on the unfused
+            # attention path. It does not cover any TP/SP collectives, so it is safe with sequence parallel.
             frozen_model_cfg.activations_checkpoint_granularity = self.cfg.get(
                 "activations_checkpoint_granularity", None
             )
@@ -142,6 +153,27 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
                 "activations_checkpoint_num_layers", None
             )
             frozen_model_cfg.activations_checkpoint_method = self.cfg.get("activations_checkpoint_method", None)
+            memory_budget = self.cfg.get("memory_budget", None)
+            if memory_budget not in (None, "min"):
+                raise ValueError(f"memory_budget must be None or 'min', got {memory_budget}")
+            if memory_budget == "min":
+                # Checkpoint the frozen layers in chunks of sqrt(L) so that only ~2*sqrt(L) layers worth of
+                # activations are kept at any point, at the cost of one extra forward through the backbone.
+                user_settings = {
+                    key: self.cfg.get(key)
+                    for key in (
+                        "activations_checkpoint_granularity",
+                        "activations_checkpoint_method",
+                        "activations_checkpoint_num_layers",
+                    )
+                    if self.cfg.get(key, None) is not None
+                }
+                if user_settings:
+                    logging.warning(f"memory_budget='min' overrides {user_settings} for the frozen GPT model.")
+                num_layers_per_stage = frozen_model_cfg.num_layers // self.cfg.get("pipeline_model_parallel_size", 1)
+                frozen_model_cfg.activations_checkpoint_granularity = "full"
+                frozen_model_cfg.activations_checkpoint_method = "uniform"
+                frozen_model_cfg.activations_checkpoint_num_layers = max(1, int(math.sqrt(num_layers_per_stage)))
 
         if cfg.get('language_model_path', None):
             self.frozen_model = MegatronGPTModel.restore_from(
@@ -213,8 +245,12 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
         else:
             raise ValueError(f"\nvirtual prompt style '{cfg.virtual_prompt_style}.'")
 
-        self._reduced_loss_buffer = []
         self._inference_config = None
+        # forward step closures only depend on self, so they are built once and reused for every step
+        self._fwd_output_and_loss_func = None
+        self._fwd_output_only_func = None
+        # side stream for host-to-device batch copies, created lazily on the training device
+        self._copy_stream = None
 
         # make sure the default pytorch lightning gradient clipping in the basemodel
         self.grad_clip_pl_default = True
@@ -276,18 +312,22 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
         if self.first_stage_of_pipeline():
             input_embeds = self.embed_input(input_ids, taskname_ids, use_cached_reps=inference)
             if self.frozen_model.mcore_gpt and hasattr(self.frozen_model.model.embedding, "position_embeddings"):
-                position_embeddings = self.frozen_model.model.embedding.position_embeddings(position_ids)
-                encoder_input = input_embeds + position_embeddings
+                position_embeddings_module = self.frozen_model.model.embedding.position_embeddings
             elif not self.frozen_model.mcore_gpt and hasattr(
                 self.frozen_model.model.language_model.embedding, "position_embeddings"
             ):
-                position_embeddings = self.frozen_model.model.language_model.embedding.position_embeddings(
-                    position_ids
-                )
-                encoder_input = input_embeds + position_embeddings
+                position_embeddings_module = self.frozen_model.model.language_model.embedding.position_embeddings
             else:
-                encoder_input = input_embeds
-            encoder_input = encoder_input.transpose(0, 1).contiguous()
+                position_embeddings_module = None
+
+            if position_embeddings_module is not None:
+                # Look up position embeddings directly in [s, b, h] and put them first so the add writes a
+                # contiguous [s, b, h] result, instead of adding in [b, s, h] and copying on transpose.
+                position_embeddings = position_embeddings_module(position_ids.t())
+                encoder_input = position_embeddings + input_embeds.transpose(0, 1)
+            else:
+                encoder_input = input_embeds.transpose(0, 1)
+            encoder_input = encoder_input.contiguous()
             if self.cfg.get("sequence_parallel", False):
                 encoder_input = tensor_parallel.mappings.scatter_to_sequence_parallel_region(encoder_input)
         else:
@@ -341,12 +381,11 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
         # only the last stages of the pipeline return losses
         if losses_reduced_per_micro_batch:
             # average loss across micro batches
-            loss_tensors_list = [loss_reduced['avg'] for loss_reduced in losses_reduced_per_micro_batch]
-            loss_tensor = torch.concat(loss_tensors_list)
-            loss_mean = loss_tensor.mean()
+            loss_sum = sum(loss_reduced['avg'] for loss_reduced in losses_reduced_per_micro_batch)
+            loss_mean = (loss_sum / len(losses_reduced_per_micro_batch)).squeeze(0)
         else:
             # we're not on the last pipeline stage so no losses
-            loss_mean = torch.tensor(0.0).cuda()
+            loss_mean = torch.zeros((), device=torch.cuda.current_device())
 
         return loss_mean
 
@@ -355,7 +394,10 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
         self._optimizer.zero_grad()
         batch, batch_idx, _ = next(dataloader_iter)
         loss_mean = self.fwd_bwd_step(itertools.chain([batch]), batch_idx, forward_only=False)
-        self.allreduce_gradients()
+        # only the virtual prompt params are trainable, no need to walk the frozen model's parameters
+        self.allreduce_gradients(
+            params=itertools.chain.from_iterable(group['params'] for group in self._optimizer_param_groups)
+        )
 
         ## logging
         # we can only log on one rank if it is rank zero so we broadcast from last rank
@@ -367,10 +409,9 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
             if loss_scale is not None:
                 self.log('loss_scale', loss_scale, batch_size=1)
 
-        self.log('reduced_train_loss', loss_mean, prog_bar=True, rank_zero_only=True, batch_size=1)
-        lr = self._optimizer.param_groups[0]['lr']
-        self.log('lr', lr, rank_zero_only=True, batch_size=1)
-        self.log('global_step', self.trainer.global_step, prog_bar=True, rank_zero_only=True, batch_size=1)
+        metrics = {'reduced_train_loss': loss_mean, 'global_step': self.trainer.global_step}
+        self.log_dict(metrics, prog_bar=True, rank_zero_only=True, batch_size=1)
+        self.log('lr', self._optimizer.param_groups[0]['lr'], rank_zero_only=True, batch_size=1)
         return loss_mean
 
     def backward(self, *args, **kwargs):
@@ -401,7 +442,7 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
             input_lenghts = torch.argmax(loss_mask, 1, keepdim=True)
 
             res = megatron_gpt_generate(
-                self.cuda(),
+                self,
                 (
                     torch.cat(
                         (
@@ -478,7 +519,7 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
             # only the last pipeline parallel stages return loss
             averaged_loss = torch.stack([i['loss'] for i in self.validation_step_outputs]).mean()
         else:
-            averaged_loss = torch.tensor(0.0).cuda()
+            averaged_loss = torch.zeros((), device=torch.cuda.current_device())
 
         # we can only log on one rank if it is rank zero so we broadcast from last rank
         torch.distributed.broadcast(averaged_loss, get_last_rank())
@@ -516,7 +557,7 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
                 val_metric = list(val_metric_dict.items())[0][1]
                 metric_name = list(val_metric_dict.items())[0][0]
             else:
-                val_metric = torch.tensor(0.0).cuda()
+                val_metric = torch.zeros((), device=torch.cuda.current_device())
                 metric_name = ''
 
             self.log(f'val_{metric_name}', val_metric, prog_bar=True, rank_zero_only=True, batch_size=1)
@@ -682,10 +723,31 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
 
         self.frozen_model.model.set_input_tensor(input_tensor)
 
+    def _batch_to_cuda(self, batch):
+        """
+        Copies the (pinned) batch to the GPU on a side stream, so the copy does not queue behind
+        compute already issued on the current stream, e.g. the backward of the previous micro batch.
+        """
+        if self._copy_stream is None:
+            self._copy_stream = torch.cuda.Stream()
+        with torch.cuda.stream(self._copy_stream):
+            batch = [x.cuda(non_blocking=True) for x in batch]
+        current_stream = torch.cuda.current_stream()
+        current_stream.wait_stream(self._copy_stream)
+        for x in batch:
+            # the tensors were allocated on the copy stream but are consumed on the current one
+            x.record_stream(current_stream)
+        return batch
+
     def get_forward_output_and_loss_func(self):
+        if self._fwd_output_and_loss_func is None:
+            self._fwd_output_and_loss_func = self._build_forward_output_and_loss_func()
+        return self._fwd_output_and_loss_func
+
+    def _build_forward_output_and_loss_func(self):
         def fwd_output_and_loss_func(dataloader_iter, model):
             batch, _, _ = next(dataloader_iter)
-            batch = [x.cuda(non_blocking=True) for x in batch]
+            batch = self._batch_to_cuda(batch)
             input_ids, labels, loss_mask, position_ids, attention_mask, taskname_ids = batch
             output_tensor = model(input_ids, position_ids, attention_mask, taskname_ids, labels, inference=False)
 
@@ -705,7 +767,11 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
         """
         Used for generate method only for now.
         """
+        if self._fwd_output_only_func is None:
+            self._fwd_output_only_func = self._build_forward_output_only_func()
+        return self._fwd_output_only_func
 
+    def _build_forward_output_only_func(self):
         def fwd_output_only_func(dataloader_iter, model):
             batch, _, _ = next(dataloader_iter)
             extra_arg = {}
@@ -718,10 +784,10 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
                 inference_max_sequence_len,
             ) = batch
 
-            tokens = tokens.cuda()
-            attention_mask = attention_mask.cuda()
-            position_ids = position_ids.cuda()
-            task_ids = task_ids.cuda()
+            tokens = tokens.cuda(non_blocking=True)
+            attention_mask = attention_mask.cuda(non_blocking=True)
+            position_ids = position_ids.cuda(non_blocking=True)
+            task_ids = task_ids.cuda(non_blocking=True)
 
             if self.frozen_model.mcore_gpt:
                 # if first step, then clear KV cache, otherwise reuse inference_paarms
@@ -794,13 +860,16 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
             get_dataset_only=True,
         )
 
-        full_dataset = [dataset[i] for i in range(len(dataset))]
-        task_ids, processed_inputs = dataset.inference_collate_fn(full_dataset)
+        # examples are already tokenized when the dataset is built, so collate them all in one go
+        task_ids, processed_inputs = dataset.inference_collate_fn(dataset.examples)
         self.frozen_model.model.parallel_output = False
 
+        # generate() may be called on a model restored on CPU, only move it when needed
+        model = self if self.device.type == 'cuda' else self.cuda()
+
         # Call same generate code as in MegatronGPT
         return megatron_gpt_generate(
-            self.cuda(), processed_inputs, self.tokenizer, length_params, sampling_params, task_ids=task_ids
+            model, processed_inputs, self.tokenizer, length_params, sampling_params, task_ids=task_ids
         )
 
     def predict_step(self, batch: Any, batch_idx: int, dataloader_idx: Optional[int] = None) -> Any:
@@ -831,7 +900,7 @@ class MegatronGPTPromptLearningModel(MegatronBasePromptLearningModel):
 
             # Call same generate code as in MegatronGPT
             return megatron_gpt_generate(
-                self.cuda(), processed_inputs, self.tokenizer, length_params, sampling_params, task_ids=task_ids
+                self, processed_inputs, self.tokenizer, length_params, sampling_params, task_ids=task_ids
             )
 
     @classmethod
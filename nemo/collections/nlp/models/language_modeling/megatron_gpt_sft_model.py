@@ -328,6 +328,7 @@ class MegatronGPTSFTModel(MegatronGPTModel):
                 dataset_cls = GPTSFTChatDataset
             else:
                 dataset_cls = GPTSFTDataset
+                dataset_kwargs = {"pretokenize": data_cfg.get("pretokenize", False)}
 
             # TODO(akoumparouli): MCore assumes/requires equal length input sequences.
             if not data_cfg.get("pad_to_max_length", False) and self.cfg.get("expert_model_parallel_size", 1) > 1:
@@ -352,7 +353,11 @@ class MegatronGPTSFTModel(MegatronGPTModel):
                 index_mapping_dir=data_cfg.get("index_mapping_dir", None),
                 prompt_template=data_cfg.get("prompt_template", None),
                 ceil_to_power_2=data_cfg.get("ceil_to_power_2", False),
-                get_attention_mask_from_fusion=data_cfg.get("get_attention_mask_from_fusion", True),
+                # only ship the dense [B, 1, L, L] causal mask to the device if the model actually consumes it,
+                # otherwise the fused attention kernels build it on device
+                get_attention_mask_from_fusion=data_cfg.get(
+                    "get_attention_mask_from_fusion", self.get_attention_mask_from_fusion
+                ),
                 global_sample_mapping=data_cfg.get("global_sample_mapping", False),
                 virtual_tokens=self.virtual_tokens,
                 tokens_to_generate=data_cfg.get("tokens_to_generate", 0),
@@ -16,6 +16,7 @@
 import os
 from typing import List, Optional, Union
 
+import numpy as np
 from attr import asdict
 from lightning.pytorch import Trainer
 from omegaconf import DictConfig
@@ -39,14 +40,15 @@ __all__ = ['get_pretrained_lm_models_list', 'get_lm_model', 'pad_batch']
 
 
 def pad_batch(batch, pad_id, max_len):
-    context_lengths = []
-    max_context_length = max([len(tokens) for tokens in batch])
-    for tokens in batch:
-        context_length = len(tokens)
-        if context_length < max_context_length + max_len:
-            tokens.extend([pad_id] * (max_context_length + max_len - context_length))
-        context_lengths.append(context_length)
-    return batch, context_lengths
+    """
+    Pads the token id lists in batch with pad_id to the longest context length plus max_len.
+    Returns the padded [batch, length] int64 array and the int64 array of the original context lengths.
+    """
+    context_lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+    padded_batch = np.full((len(batch), context_lengths.max() + max_len), pad_id, dtype=np.int64)
+    for i, tokens in enumerate(batch):
+        padded_batch[i, : context_lengths[i]] = tokens
+    return padded_batch, context_lengths
 
 
 def get_pretrained_lm_models_list(include_external: bool = False) -> List[str]:
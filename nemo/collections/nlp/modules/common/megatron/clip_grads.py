@@ -114,7 +114,8 @@ def clip_grad_norm_fp32(parameters, max_norm, norm_type=2, use_fsdp=False):
     # Calculate norm.
     if norm_type == inf:
         if len(grads_for_norm) > 0:  # (@adithyare) grads_for_norm can be empty for adapter training with pp>1
-            total_norm = max(grad.abs().max() for grad in grads_for_norm)
+            # one foreach kernel and an on-device max, rather than a python max() that syncs on every comparison
+            total_norm = torch.stack(torch._foreach_norm(grads_for_norm, inf)).max()
 
         if not use_fsdp:
             # Take max across all model-parallel GPUs.
@@ -123,13 +124,13 @@ def clip_grad_norm_fp32(parameters, max_norm, norm_type=2, use_fsdp=False):
             )
         else:
             if len(sharded_grads_for_norm) > 0:
-                sharded_total_norm = max(grad.abs().max() for grad in sharded_grads_for_norm)
-                total_norm = max(total_norm, sharded_total_norm)
+                sharded_total_norm = torch.stack(torch._foreach_norm(sharded_grads_for_norm, inf)).max()
+                total_norm = torch.maximum(total_norm, sharded_total_norm)
             # Take max across both model-parallel and data-parallel GPUs.
             torch.distributed.all_reduce(total_norm, op=torch.distributed.ReduceOp.MAX)
 
     else:
-        if norm_type == 2.0:
+        if norm_type == 2.0 and HAVE_APEX:
             dummy_overflow_buf = torch.zeros(1, device='cuda', dtype=torch.int32).squeeze()
             # Use apex's multi-tensor applier for efficiency reasons.
             # Multi-tensor applier takes a function and a list of list
@@ -152,13 +153,15 @@ def clip_grad_norm_fp32(parameters, max_norm, norm_type=2, use_fsdp=False):
                     sharded_grad_norm = torch.zeros(1, device='cuda', dtype=torch.float32).squeeze()
                 total_sharded_norm = sharded_grad_norm**norm_type
         else:
-            for grad in grads_for_norm:
-                grad_norm = torch.norm(grad, norm_type)
-                total_norm += grad_norm**norm_type
+            # per-tensor norms are computed with one foreach kernel per device/dtype group
+            if len(grads_for_norm) > 0:
+                total_norm = torch.stack(torch._foreach_norm(grads_for_norm, norm_type)).pow(norm_type).sum()
             if use_fsdp:
-                for grad in sharded_grads_for_norm:
-                    grad_norm = torch.norm(grad, norm_type)
-                    total_sharded_norm += grad_norm**norm_type
+                total_sharded_norm = torch.zeros(1, device='cuda', dtype=torch.float32).squeeze()
+                if len(sharded_grads_for_norm) > 0:
+                    total_sharded_norm = (
+                        torch.stack(torch._foreach_norm(sharded_grads_for_norm, norm_type)).pow(norm_type).sum()
+                    )
 
         if use_fsdp:
             # Sum norm of grad shards across data-parallel GPUs.
@@ -219,9 +219,10 @@ def get_ltor_masks_and_position_ids(
 
     attention_mask = None
     if compute_attention_mask:
-        attention_mask = torch.tril(torch.ones((att_mask_batch, seq_length, seq_length), device=data.device)).view(
-            att_mask_batch, 1, seq_length, seq_length
-        )
+        # built as bool from the start, a float mask would take 4x the [s, s] memory just to be thresholded
+        attention_mask = torch.tril(
+            torch.ones((att_mask_batch, seq_length, seq_length), dtype=torch.bool, device=data.device)
+        ).view(att_mask_batch, 1, seq_length, seq_length)
 
     # Loss mask.
     loss_mask = torch.ones(data.size(), dtype=torch.float, device=data.device)
@@ -258,8 +259,8 @@ def get_ltor_masks_and_position_ids(
                     prev_index = i + 1
 
     if compute_attention_mask:
-        # Convert attention mask to binary:
-        attention_mask = attention_mask < 0.5
+        # Convert attention mask to binary (True for the masked out positions):
+        attention_mask = ~attention_mask
 
     return attention_mask, loss_mask, position_ids
 
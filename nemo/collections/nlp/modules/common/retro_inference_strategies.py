@@ -80,8 +80,8 @@ class RetroModelTextGenerationStrategy(TextGenerationStrategy):
                     padded.append(line)
             context_tokens = padded
         context_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     def tokenize_batch_with_context_and_completion(self, sentences, max_len, add_BOS):
@@ -115,8 +115,8 @@ class RetroModelTextGenerationStrategy(TextGenerationStrategy):
                     padded.append(line[0] + line[1])
             context_tokens = padded
         context_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     def clip_max_len(self, maxlen: int) -> int:
@@ -280,8 +280,8 @@ class RetroQAModelTextGenerationStrategy(RetroModelTextGenerationStrategy):
                     padded.append([tokenizer.pad_id] * pad_len + line)
             context_tokens = padded
         context_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     def init_batch(self, context_tokens: torch.Tensor, context_length: int):
@@ -453,6 +453,6 @@ class RetroFileQAModelTextGenerationStrategy(RetroQAModelTextGenerationStrategy)
                 padded.append([tokenizer.eos_id] * pad_len + line)
             context_tokens = padded
         context_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
@@ -83,6 +83,27 @@ class TextGenerationStrategy:
 
         return output_tensor
 
+    def _get_step_arrays(self, step, maxlen, micro_batch_size, compute_attention_mask, device=None):
+        """
+        Returns the attention mask repeated over the micro batch, the set_inference_key_value_memory flags and the
+        max sequence length array for a generation step. They only differ between the first step, which allocates
+        the KV cache, and all later steps, so they are built once at step 0 and reused for the rest of generation.
+        """
+        if step == 0:
+            self._attention_mask_repeat = None
+            if compute_attention_mask:
+                # a stride-0 view, the rows are identical so there is nothing to copy
+                self._attention_mask_repeat = self.attention_mask.expand(
+                    micro_batch_size, *self.attention_mask.shape[1:]
+                )
+            self._first_step_setkey_value_array = torch.tensor([True] * micro_batch_size, device=device)
+            self._next_step_setkey_value_array = torch.tensor([False] * micro_batch_size, device=device)
+            self._len_array = torch.tensor([maxlen] * micro_batch_size, device=device)
+            setkey_value_array = self._first_step_setkey_value_array
+        else:
+            setkey_value_array = self._next_step_setkey_value_array
+        return self._attention_mask_repeat, setkey_value_array, self._len_array
+
     def tokenize_batch(self, sentences, max_len, add_BOS):
         """
         convert the sentences into lists of tokens, pad them to the same length, add bos tokens if it is needed
@@ -106,9 +127,9 @@ class TextGenerationStrategy:
             context_tokens = [tokenizer.tokenizer.get_prefix_tokens() + tokenizer.text_to_ids(s) for s in sentences]
         else:
             context_tokens = [tokenizer.text_to_ids(s) for s in sentences]
-        context_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        padded_tokens, context_lengths = pad_batch(context_tokens, tokenizer.eos_id, max_len)
+        context_tokens_tensor = torch.from_numpy(padded_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     @abc.abstractclassmethod
@@ -309,30 +330,26 @@ class GPTModelTextGenerationStrategy(TextGenerationStrategy):
         # types2use = None
         if step == 0:
             # Allocate memory for the entire context.
-            set_inference_key_value_memory = True
             tokens2use = tokens[:, :context_length]
             positions2use = self.position_ids[:, :context_length]
             # not using type2use. uncomment it if it is used
             # if type_ids is not None:
             #     types2use = type_ids[:, :context_length]
+            # every later step feeds one token per sequence, always through the same contiguous buffers
+            self._step_tokens = tokens.new_empty((micro_batch_size, 1))
+            self._step_positions = self.position_ids.new_empty((micro_batch_size, 1))
         else:
             # Set this to false so the memory is not reallocated.
-            set_inference_key_value_memory = False
-            tokens2use = tokens[:, context_length - 1].view(micro_batch_size, -1)
-            positions2use = self.position_ids[:, context_length - 1].view(micro_batch_size, -1)
+            tokens2use = self._step_tokens.copy_(tokens[:, context_length - 1 : context_length])
+            positions2use = self._step_positions.copy_(self.position_ids[:, context_length - 1 : context_length])
             # not using type2use. uncomment it if it is used
             # if type_ids is not None:
             #     types2use = type_ids[:, context_length - 1].view(batch_size, -1)
 
         """Prepare batch for each of the inference steps"""
-        attention_mask_repeat = None
-        if compute_attention_mask:
-            attention_mask_repeat = torch.concat([self.attention_mask for _ in range(micro_batch_size)])
-
-        setkey_value_array = torch.tensor(
-            [set_inference_key_value_memory] * micro_batch_size, device=torch.cuda.current_device()
+        attention_mask_repeat, setkey_value_array, len_array = self._get_step_arrays(
+            step, maxlen, micro_batch_size, compute_attention_mask, device=torch.cuda.current_device()
         )
-        len_array = torch.tensor([maxlen] * micro_batch_size, device=torch.cuda.current_device())
 
         batch = [tokens2use, attention_mask_repeat, positions2use, setkey_value_array, len_array]
         tensor_shape = [tokens2use.shape[1], micro_batch_size, self.model.cfg.hidden_size]
@@ -531,8 +548,8 @@ class NevaModelTextGenerationStrategy(TextGenerationStrategy):
             raise ValueError(f'{type(prompt)} is not supported for tokenization')
 
         context_tokens, context_lengths = pad_batch(context_tokens, self.tokenizer.eos_id, max_len)
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     def prepare_batch_at_step(
@@ -551,7 +568,6 @@ class NevaModelTextGenerationStrategy(TextGenerationStrategy):
         # types2use = None
         if step == 0:
             # Allocate memory for the entire context.
-            set_inference_key_value_memory = True
             tokens2use = tokens[:, :context_length]
             positions2use = self.position_ids[:, :context_length]
             # not using type2use. uncomment it if it is used
@@ -559,7 +575,6 @@ class NevaModelTextGenerationStrategy(TextGenerationStrategy):
             #     types2use = type_ids[:, :context_length]
         else:
             # Set this to false so the memory is not reallocated.
-            set_inference_key_value_memory = False
             tokens2use = tokens[:, context_length - 1].view(micro_batch_size, -1)
             positions2use = self.position_ids[:, context_length - 1].view(micro_batch_size, -1)
             # not using type2use. uncomment it if it is used
@@ -568,14 +583,9 @@ class NevaModelTextGenerationStrategy(TextGenerationStrategy):
             media = None
 
         """Prepare batch for each of the inference steps"""
-        attention_mask_repeat = None
-        if compute_attention_mask:
-            attention_mask_repeat = torch.concat([self.attention_mask for _ in range(micro_batch_size)])
-
-        setkey_value_array = torch.tensor(
-            [set_inference_key_value_memory] * micro_batch_size, device=torch.cuda.current_device()
+        attention_mask_repeat, setkey_value_array, len_array = self._get_step_arrays(
+            step, maxlen, micro_batch_size, compute_attention_mask, device=torch.cuda.current_device()
         )
-        len_array = torch.tensor([maxlen] * micro_batch_size, device=torch.cuda.current_device())
         batch = [tokens2use, attention_mask_repeat, positions2use, media, setkey_value_array, len_array]
         tensor_shape = [tokens2use.shape[1], micro_batch_size, self.model.cfg.hidden_size]
         return batch, tensor_shape
@@ -620,7 +630,6 @@ class PromptLearningModelTextGenerationStrategy(TextGenerationStrategy):
         # types2use = None
         if step == 0:
             # Allocate memory for the entire context.
-            set_inference_key_value_memory = True
             tokens2use = tokens[:, :context_length]
             positions2use = self.position_ids[:, :context_length]
             # not using type2use. uncomment it if it is used
@@ -628,7 +637,6 @@ class PromptLearningModelTextGenerationStrategy(TextGenerationStrategy):
             #     types2use = type_ids[:, :context_length]
         else:
             # Set this to false so the memory is not reallocated.
-            set_inference_key_value_memory = False
             tokens2use = tokens[:, context_length - 1].view(micro_batch_size, -1)
             positions2use = self.position_ids[:, context_length - 1].view(micro_batch_size, -1)
             # not using type2use. uncomment it if it is used
@@ -636,13 +644,10 @@ class PromptLearningModelTextGenerationStrategy(TextGenerationStrategy):
             #     types2use = type_ids[:, context_length - 1].view(batch_size, -1)
 
         """Prepare batch for each of the inference steps"""
-        attention_mask_repeat = None
-        if compute_attention_mask:
-            attention_mask_repeat = torch.concat([self.attention_mask for _ in range(micro_batch_size)])
-        setkey_value_array = torch.tensor(
-            [set_inference_key_value_memory] * micro_batch_size, device=torch.cuda.current_device()
+        # the flags are only read on the host with .item(), keep them on CPU to avoid a device sync per token
+        attention_mask_repeat, setkey_value_array, len_array = self._get_step_arrays(
+            step, maxlen, micro_batch_size, compute_attention_mask
         )
-        len_array = torch.tensor([maxlen] * micro_batch_size, device=torch.cuda.current_device())
 
         batch = [tokens2use, attention_mask_repeat, positions2use, self.task_ids, setkey_value_array, len_array]
         tensor_shape = [tokens2use.shape[1], micro_batch_size, self.model.frozen_model.cfg.hidden_size]
@@ -695,8 +700,8 @@ class McoreRetroModelTextGenerationStrategy(TextGenerationStrategy):
         # attention, not pad_batch, padding will be done at init_batch
         context_tokens, context_lengths = pad_batch(batch=context_tokens, pad_id=tokenizer.eos_id, max_len=0)
 
-        context_tokens_tensor = torch.cuda.LongTensor(context_tokens)
-        context_length_tensor = torch.cuda.LongTensor(context_lengths)
+        context_tokens_tensor = torch.from_numpy(context_tokens).cuda()
+        context_length_tensor = torch.from_numpy(context_lengths).cuda()
         return context_tokens_tensor, context_length_tensor
 
     def tokenize_neighbors_batch(self, neighbors, retro_args):
@@ -17,6 +17,7 @@
 
 """Utilities for generating text."""
 
+import inspect
 import os
 import pickle
 import re
@@ -44,6 +45,17 @@ except (ImportError, ModuleNotFoundError):
 
     HAVE_MEGATRON_CORE = False
 
+try:
+    from flashinfer.sampling import top_k_top_p_sampling_from_logits
+
+    # older releases take positional uniform_samples and return (samples, success), which the sampler cannot use
+    _flashinfer_sampling_params = inspect.signature(top_k_top_p_sampling_from_logits).parameters
+    HAVE_FLASHINFER = 'top_k' in _flashinfer_sampling_params and 'uniform_samples' not in _flashinfer_sampling_params
+
+except (ImportError, ModuleNotFoundError):
+
+    HAVE_FLASHINFER = False
+
 try:
     from megatron.core.num_microbatches_calculator import reconfigure_num_microbatches_calculator
 
@@ -271,6 +283,18 @@ def tab_logits(logits, min_id, max_id, filter_value=-float('Inf')):
     return logits
 
 
+def _tab_filter_masks(tokenid_range, eor_id, eod_id, vocab_size, device):
+    """
+    Builds one [vocab_size] mask per position in a table row, marking the token ids that tab_logits
+    would filter out at that position. The last position of a row only allows the end of row/document tokens.
+    """
+    ranges = list(tokenid_range) + [(min(eor_id, eod_id), max(eor_id, eod_id) + 1)]
+    masks = torch.ones((len(ranges), vocab_size), dtype=torch.bool)
+    for row, (min_id, max_id) in enumerate(ranges):
+        masks[row, min_id:max_id] = False
+    return masks.to(device)
+
+
 def top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started=None):
     """
     This function has been mostly taken from huggingface conversational
@@ -290,10 +314,8 @@ def top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started
         # last token of the top-k
         indices_to_remove = logits < torch.topk(logits, top_k)[0][..., -1, None]
         if started is not None:
-            for i in np.arange(indices_to_remove.size(0))[started.cpu().numpy()]:
-                logits[i, indices_to_remove[i]] = filter_value
-        else:
-            logits[indices_to_remove] = filter_value
+            indices_to_remove &= started[:, None]
+        logits.masked_fill_(indices_to_remove, filter_value)
 
     if 0.0 < top_p < 1.0:
         # Cconvert to 1D
@@ -306,18 +328,54 @@ def top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started
         # above the threshold
         sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
         sorted_indices_to_remove[..., 0] = 0
+        # Map the mask back from sorted to vocab order for the whole batch at once
+        indices_to_remove = sorted_indices_to_remove.scatter(-1, sorted_indices, sorted_indices_to_remove)
         if started is not None:
-            for i in np.arange(sorted_indices.size(0))[started.cpu().numpy()]:
-                indices_to_remove = sorted_indices[i][sorted_indices_to_remove[i]]
-                logits[i, indices_to_remove] = filter_value
-        else:
-            for i in range(sorted_indices.size(0)):
-                indices_to_remove = sorted_indices[i][sorted_indices_to_remove[i]]
-                logits[i, indices_to_remove] = filter_value
+            indices_to_remove &= started[:, None]
+        logits.masked_fill_(indices_to_remove, filter_value)
 
     return logits
 
 
+# columns the [b, s, v] full log prob buffer grows by, it is too large to preallocate for the whole generation
+_FULL_LOGITS_GROWTH = 32
+
+
+def _append_columns(buffer, length, new_columns, grow_by=0):
+    """
+    Writes new_columns into buffer right after its first length columns, returns the buffer and the new length.
+    The buffer is only reallocated if the write does not fit into it, with room for grow_by more columns.
+    """
+    end = length + new_columns.size(1)
+    if end > buffer.size(1):
+        new_buffer = buffer.new_empty((buffer.size(0), end + grow_by) + buffer.shape[2:])
+        new_buffer[:, :length] = buffer[:, :length]
+        buffer = new_buffer
+    buffer[:, length:end] = new_columns
+    return buffer, end
+
+
+def _new_column_buffer(first_columns, capacity):
+    """Allocates a buffer with room for capacity columns and writes first_columns at its start."""
+    num_columns = max(capacity, first_columns.size(1))
+    buffer = first_columns.new_empty((first_columns.size(0), num_columns) + first_columns.shape[2:])
+    return _append_columns(buffer, 0, first_columns)
+
+
+def _gathered_log_softmax(logits, indices):
+    """
+    Log probabilities of the tokens in ``indices`` ([b, s, 1]) under ``logits`` ([b, s, v]).
+    Equivalent to gathering from ``log_softmax(logits, 2)`` without materializing the [b, s, v] result.
+    The subtraction is inaccurate in bf16/fp16, so reduced precision [b, 1, v] decode slices are upcast to fp32 and
+    reduced precision prompts, where an fp32 copy would be large, fall back to ``log_softmax``.
+    """
+    if logits.dtype != torch.float32:
+        if logits.size(1) > 1:
+            return torch.gather(F.log_softmax(logits, 2), 2, indices).squeeze(2)
+        return _gathered_log_softmax(logits.float(), indices).to(logits.dtype)
+    return torch.gather(logits, 2, indices).squeeze(2) - torch.logsumexp(logits, 2)
+
+
 def repetition_penalty(logits, repetition_penalty, used_tokens):
     """Implement the repetition penalty, check paper
     https://arxiv.org/pdf/1909.05858.pdf
@@ -368,7 +426,8 @@ def send_generate_info(
     src = get_model_parallel_src_rank()
     if random_seed is None:
         random_seed = -1  # to be able to convert to float
-    # Send the sizes of the tensors
+    end_strings_array = np.frombuffer(pickle.dumps(end_strings), dtype=np.uint8)
+    # Send the sizes of the tensors. float64 keeps every integer field (e.g. top_k, random_seed) exact.
     input_info = [
         context_tokens_tensor.size(0),  # batch_size
         context_tokens_tensor.size(1),  # seq_len
@@ -382,21 +441,21 @@ def send_generate_info(
         repetition_penalty,
         min_tokens_to_generate,
         random_seed,
+        end_strings_array.size,  # size of the pickled end strings
     ]
-    input_info_tensor = torch.cuda.FloatTensor(input_info)
+    input_info_tensor = torch.tensor(input_info, dtype=torch.float64, device=torch.cuda.current_device())
     torch.distributed.broadcast(input_info_tensor, src, model_parallel_group)
 
-    # Send variables to all ranks
-    torch.distributed.broadcast(context_length_tensor, src, model_parallel_group)
-    torch.distributed.broadcast(context_tokens_tensor, src, model_parallel_group)
-
-    # send end strings
-    string_tensor = torch.as_tensor(
-        np.frombuffer(pickle.dumps(end_strings), dtype=np.int8), device=torch.cuda.current_device()
+    # Send the context lengths, context tokens and pickled end strings to all ranks in a single broadcast
+    device = torch.cuda.current_device()
+    payload = torch.cat(
+        [
+            context_length_tensor.reshape(-1).to(device=device, dtype=torch.int64),
+            context_tokens_tensor.reshape(-1).to(device=device, dtype=torch.int64),
+            torch.from_numpy(end_strings_array.astype(np.int64)).to(device),
+        ]
     )
-    size = torch.as_tensor([string_tensor.size(0)], device=torch.cuda.current_device(), dtype=torch.int64)
-    torch.distributed.broadcast(size, src, model_parallel_group)
-    torch.distributed.broadcast(string_tensor, src, model_parallel_group)
+    torch.distributed.broadcast(payload, src, model_parallel_group)
 
 
 def receive_generate_info():
@@ -405,35 +464,35 @@ def receive_generate_info():
     """
     model_parallel_group = parallel_state.get_model_parallel_group()
     src = get_model_parallel_src_rank()
-    input_info_tensor = torch.empty(12, dtype=torch.float32, device=torch.cuda.current_device())
+    input_info_tensor = torch.empty(13, dtype=torch.float64, device=torch.cuda.current_device())
     torch.distributed.broadcast(input_info_tensor, src, model_parallel_group)
-    batch_size = int(input_info_tensor[0].item())
-    seq_len = int(input_info_tensor[1].item())
-    tokens_to_generate = int(input_info_tensor[2].item())
-    all_probs = bool(input_info_tensor[3].item())
-    compute_logprob = bool(input_info_tensor[4].item())  # whether to compute log probabilities matrix
-    temperature = float(input_info_tensor[5].item())
-    top_k = int(input_info_tensor[6].item())
-    top_p = float(input_info_tensor[7].item())
-    greedy = bool(input_info_tensor[8].item())
-    repetition_penalty = float(input_info_tensor[9].item())
-    min_tokens_to_generate = int(input_info_tensor[10].item())
-    random_seed = int(input_info_tensor[11].item())
+    input_info = input_info_tensor.tolist()
+    batch_size = int(input_info[0])
+    seq_len = int(input_info[1])
+    tokens_to_generate = int(input_info[2])
+    all_probs = bool(input_info[3])
+    compute_logprob = bool(input_info[4])  # whether to compute log probabilities matrix
+    temperature = float(input_info[5])
+    top_k = int(input_info[6])
+    top_p = float(input_info[7])
+    greedy = bool(input_info[8])
+    repetition_penalty = float(input_info[9])
+    min_tokens_to_generate = int(input_info[10])
+    random_seed = int(input_info[11])
     if random_seed == -1:  # was converted to -1 before broadcast
         random_seed = None
+    end_strings_size = int(input_info[12])
 
-    context_length_tensor = torch.empty(batch_size, dtype=torch.int64, device=torch.cuda.current_device())
-    context_tokens_tensor = torch.empty(batch_size, seq_len, dtype=torch.int64, device=torch.cuda.current_device())
-    # Send variables to all ranks
-    torch.distributed.broadcast(context_length_tensor, src, model_parallel_group)
-    torch.distributed.broadcast(context_tokens_tensor, src, model_parallel_group)
-
-    array_size = torch.empty(1, dtype=torch.int64, device=torch.cuda.current_device())
-    torch.distributed.broadcast(array_size, src, model_parallel_group)
-
-    string_tensor = torch.empty(array_size[0], dtype=torch.int8, device=torch.cuda.current_device())
-    torch.distributed.broadcast(string_tensor, src, model_parallel_group)
-    bytes = string_tensor.cpu().numpy().tobytes()
+    # Receive variables from the source rank, see send_generate_info for the layout
+    payload = torch.empty(
+        batch_size + batch_size * seq_len + end_strings_size, dtype=torch.int64, device=torch.cuda.current_device()
+    )
+    torch.distributed.broadcast(payload, src, model_parallel_group)
+    context_length_tensor, context_tokens_tensor, string_tensor = torch.split(
+        payload, [batch_size, batch_size * seq_len, end_strings_size]
+    )
+    context_tokens_tensor = context_tokens_tensor.view(batch_size, seq_len)
+    bytes = string_tensor.cpu().numpy().astype(np.uint8).tobytes()
     end_strings = pickle.loads(bytes)
 
     return (
@@ -520,9 +579,12 @@ def synced_generate(
     if parallel_state.is_pipeline_last_stage():
         src = parallel_state.get_pipeline_model_parallel_last_rank()
         group = parallel_state.get_embedding_group()
+        # the samplers hand out views into preallocated buffers, broadcast needs contiguous tensors
         if compute_logprob:
+            output_logits = output_logits.contiguous()
             torch.distributed.broadcast(output_logits, src, group)
         if all_probs:
+            full_logits = full_logits.contiguous()
             src = parallel_state.get_pipeline_model_parallel_last_rank()
             group = parallel_state.get_embedding_group()
             torch.distributed.broadcast(full_logits, src, group)
@@ -731,21 +793,25 @@ def generate(
         resp_sentences_seg = []
 
         decode_tokens = decode_tokens.cpu().numpy().tolist()
+        # looked up once, not for every generated token
+        is_tabular_tokenizer = isinstance(tokenizer, TabularTokenizer)
+        byte_decoder = getattr(tokenizer.tokenizer, 'byte_decoder', None)
+        # token id -> word, each distinct id in the batch is converted (and byte decoded) only once
+        id_to_word = {}
         for decode_token in decode_tokens:
             sentence = tokenizer.ids_to_text(decode_token)
             resp_sentences.append(sentence)
-            if not isinstance(tokenizer, TabularTokenizer):
+            if not is_tabular_tokenizer:
                 words = []
                 for token in decode_token:
-                    if not isinstance(token, Iterable):
-                        token = [token]
-                    word = tokenizer.ids_to_tokens(token)
-                    if isinstance(word, Iterable):
-                        word = word[0]
-                    if hasattr(tokenizer.tokenizer, 'byte_decoder'):
-                        word = bytearray([tokenizer.tokenizer.byte_decoder[c] for c in word]).decode(
-                            'utf-8', errors='replace'
-                        )
+                    word = id_to_word.get(token)
+                    if word is None:
+                        word = tokenizer.ids_to_tokens(token if isinstance(token, Iterable) else [token])
+                        if isinstance(word, Iterable):
+                            word = word[0]
+                        if byte_decoder is not None:
+                            word = bytearray(map(byte_decoder.__getitem__, word)).decode('utf-8', errors='replace')
+                        id_to_word[token] = word
                     words.append(word)
                 resp_sentences_seg.append(words)
             else:
@@ -842,6 +908,18 @@ def sample_sequence_batch(
         maxlen = inference_strategy.clip_max_len(maxlen)
 
         lengths = torch.ones([batch_size]).long().cuda() * maxlen
+        # async broadcasts issued by the last pipeline stage in the previous step
+        pending_broadcasts = []
+        # greedy decoding writes its argmax into the same buffer at every step
+        greedy_tokens = None
+        # opt-in, since FlashInfer draws from a different random stream than torch.multinomial
+        use_flashinfer_sampling = model.cfg.get('use_flashinfer_sampling', False)
+        if use_flashinfer_sampling and not HAVE_FLASHINFER:
+            logging.warning(
+                "use_flashinfer_sampling is set but a compatible flashinfer is not installed, "
+                "falling back to torch sampling."
+            )
+            use_flashinfer_sampling = False
 
         while context_length < maxlen:
             if image_list is not None:
@@ -885,24 +963,35 @@ def sample_sequence_batch(
 
                 started = context_lengths <= context_length
                 if extra.get('greedy', False):
-                    prev = torch.argmax(logits, dim=-1).view(-1)
+                    if greedy_tokens is None:
+                        greedy_tokens = torch.empty(batch_size, dtype=torch.long, device=logits.device)
+                    prev = torch.argmax(logits, dim=-1, out=greedy_tokens)
                 else:
                     logits = logits.float()
                     logits /= temperature
                     # handle repetition penality
                     logits = repetition_penalty(logits, extra.get('repetition_penalty', 1.2), all_generated_indices)
-                    logits = top_k_logits(
-                        logits, top_k=extra.get('top_k', 0), top_p=extra.get('top_p', 0.9), started=started
-                    )
-                    probs = F.softmax(logits, dim=-1)
-                    prev = torch.multinomial(probs, num_samples=1).view(-1)
+                    top_k, top_p = extra.get('top_k', 0), extra.get('top_p', 0.9)
+                    if use_flashinfer_sampling and logits.is_cuda:
+                        # fused top-k/top-p filtering, softmax and sampling in one kernel; rows that have not
+                        # started yet are discarded by the switch below, so they need no special handling
+                        prev = top_k_top_p_sampling_from_logits(
+                            logits,
+                            top_k=top_k if top_k > 0 else logits.size(-1),
+                            top_p=top_p if 0.0 < top_p < 1.0 else 1.0,
+                        )
+                        prev = prev.long().view(-1)
+                    else:
+                        logits = top_k_logits(logits, top_k=top_k, top_p=top_p, started=started)
+                        probs = F.softmax(logits, dim=-1)
+                        prev = torch.multinomial(probs, num_samples=1).view(-1)
 
                 # Clamp the predicted out of vocabulary tokens
-                prev = torch.clamp(prev, max=tokenizer.vocab_size - 1)
-                new_tokens = switch(tokens[:, context_length].view(-1), prev, started)
+                prev.clamp_(max=tokenizer.vocab_size - 1)
+                new_tokens = torch.where(started, prev, tokens[:, context_length].view(-1))
 
                 # Replace sampled tokens w/ done token if EOD has already been sampled
-                new_tokens = switch(new_tokens, eod_id, is_done)
+                new_tokens.masked_fill_(is_done.bool(), eod_id)
 
                 # post process the inference tokens based on the strategy
                 inference_strategy.post_process(tokens, new_tokens, context_length)
@@ -911,28 +1000,46 @@ def sample_sequence_batch(
                 tokens[:, context_length] = new_tokens
 
                 if compute_logprob:
+                    # log probs are written into buffers sized for the whole generation (one column per
+                    # token after the first), and the filled part is handed out as a view; the full log probs
+                    # buffer is grown in chunks instead
                     if output_logits is None:
-                        output = F.log_softmax(output[:, :context_length, :], 2)
-
                         indices = torch.unsqueeze(tokens[:, 1 : context_length + 1], 2)
-                        output_logits = torch.gather(output, 2, indices).squeeze(2)
-                        all_generated_indices = indices[:, :, 0]
                         if all_probs:
-                            full_logits = output
+                            output = F.log_softmax(output[:, :context_length, :], 2)
+                            context_logits = torch.gather(output, 2, indices).squeeze(2)
+                        else:
+                            context_logits = _gathered_log_softmax(output[:, :context_length, :], indices)
+                        logits_buffer, num_logits = _new_column_buffer(context_logits, maxlen - 1)
+                        indices_buffer, _ = _new_column_buffer(indices[:, :, 0], maxlen - 1)
+                        if all_probs:
+                            full_logits_buffer, num_full_logits = output, output.size(1)
                     else:
-                        output = F.log_softmax(output, 2)
                         indices = torch.unsqueeze(new_tokens, 1).unsqueeze(2)
-                        new_output_logits = torch.gather(output, 2, indices).squeeze(2)
+                        if all_probs:
+                            output = F.log_softmax(output, 2)
+                            new_output_logits = torch.gather(output, 2, indices).squeeze(2)
+                        else:
+                            new_output_logits = _gathered_log_softmax(output, indices)
 
-                        # TODO(rprenger) we're copying output_logits every time.  Should pre-allocate
-                        output_logits = torch.cat([output_logits, new_output_logits], 1)
-                        all_generated_indices = torch.cat([all_generated_indices, indices[:, :, 0]], 1)
+                        indices_buffer, _ = _append_columns(indices_buffer, num_logits, indices[:, :, 0])
+                        logits_buffer, num_logits = _append_columns(logits_buffer, num_logits, new_output_logits)
                         if all_probs:
-                            full_logits = torch.cat([full_logits, output], 1)
+                            full_logits_buffer, num_full_logits = _append_columns(
+                                full_logits_buffer, num_full_logits, output, grow_by=_FULL_LOGITS_GROWTH
+                            )
+                    output_logits = logits_buffer[:, :num_logits]
+                    all_generated_indices = indices_buffer[:, :num_logits]
+                    if all_probs:
+                        full_logits = full_logits_buffer[:, :num_full_logits]
 
+                # The last stage is the source of the new_tokens and done broadcasts and does not read them back,
+                # so they are issued asynchronously and only waited on before the next step issues its own.
+                for handle in pending_broadcasts:
+                    handle.wait()
                 src = parallel_state.get_pipeline_model_parallel_last_rank()
                 group = parallel_state.get_embedding_group()
-                torch.distributed.broadcast(new_tokens, src, group)
+                pending_broadcasts = [torch.distributed.broadcast(new_tokens, src, group, async_op=True)]
 
                 #                done_token = (prev == eod_id).byte() & started.byte()
                 done_token = inference_strategy.end_of_generation_condition(
@@ -947,7 +1054,7 @@ def sample_sequence_batch(
                 done = torch.all(is_done)
                 src = parallel_state.get_pipeline_model_parallel_last_rank()
                 group = parallel_state.get_pipeline_model_parallel_group()
-                torch.distributed.broadcast(done, src, group)
+                pending_broadcasts.append(torch.distributed.broadcast(done, src, group, async_op=True))
                 if compute_logprob:
                     if all_probs:
                         yield tokens, lengths, output_logits, full_logits
@@ -977,6 +1084,9 @@ def sample_sequence_batch(
             if done:
                 break
 
+        for handle in pending_broadcasts:
+            handle.wait()
+
 
 def tab_sample_sequence_batch(
     model,
@@ -1040,6 +1150,7 @@ def tab_sample_sequence_batch(
             maxlen = model.cfg.encoder_seq_length
 
         lengths = torch.ones([batch_size]).long().cuda() * maxlen
+        filter_masks = None
 
         while context_length < maxlen:
             batch, tensor_shape = inference_strategy.prepare_batch_at_step(
@@ -1048,32 +1159,28 @@ def tab_sample_sequence_batch(
             output = inference_strategy.forward_step(batch, tensor_shape)
 
             if parallel_state.is_pipeline_last_stage():
-                output = output[0]['logits'].float()
-                output = tensor_parallel.gather_from_tensor_model_parallel_region(output)
+                # gather the vocab shards in the model dtype and upcast once afterwards,
+                # the values are the same but the gather moves half the bytes for fp16/bf16 models
+                output = tensor_parallel.gather_from_tensor_model_parallel_region(output[0]['logits'])
                 assert output is not None
                 output = output.float()
                 logits = output[:, -1].view(batch_size, -1).contiguous()
                 token_in_row = (counter + offset) % tokens_per_row
-                logits = logits.float()
                 logits /= temperature
-                if token_in_row == tokens_per_row - 1:
-                    # line break
-                    eor_id = tokenizer.eor
-                    eod_id = tokenizer.eos_id
-                    min_id = min(eor_id, eod_id)
-                    max_id = max(eor_id, eod_id) + 1
-                    logits = tab_logits(logits, min_id, max_id)
-                else:
-                    # limit the range
-                    min_id, max_id = tokenid_range[token_in_row]
-                    logits = tab_logits(logits, min_id, max_id)
+                if filter_masks is None:
+                    # the allowed token ids only depend on the position in the row (the last one is the line break),
+                    # so the masks are built once and each step applies one of them
+                    filter_masks = _tab_filter_masks(
+                        tokenid_range, tokenizer.eor, tokenizer.eos_id, logits.size(-1), logits.device
+                    )
+                logits.masked_fill_(filter_masks[token_in_row], -float('Inf'))
                 probs = F.softmax(logits, dim=-1)
                 prev = torch.multinomial(probs, num_samples=1).view(-1)
                 started = context_lengths <= context_length
                 # Clamp the out of vocabulary tokens.
                 prev = torch.clamp(prev, max=tokenizer.vocab_size - 1)
 
-                new_tokens = switch(tokens[:, context_length].view(-1), prev, started)
+                new_tokens = torch.where(started, prev, tokens[:, context_length].view(-1))
 
                 # post process the inference tokens based on the strategy
                 inference_strategy.post_process(tokens, new_tokens, context_length)
@@ -1081,20 +1188,31 @@ def tab_sample_sequence_batch(
                 tokens[:, context_length] = new_tokens
 
                 if output_logits is None:
-                    output_context = F.log_softmax(output[:, :context_length, :], 2)
                     indices = torch.unsqueeze(tokens[:, 1 : context_length + 1], 2)
-                    output_logits = torch.gather(output_context, 2, indices).squeeze(2)
                     if all_probs:
-                        full_logits = output_context
+                        output_context = F.log_softmax(output[:, :context_length, :], 2)
+                        context_logits = torch.gather(output_context, 2, indices).squeeze(2)
+                    else:
+                        context_logits = _gathered_log_softmax(output[:, :context_length, :], indices)
+                    logits_buffer, num_logits = _new_column_buffer(context_logits, maxlen - 1)
+                    if all_probs:
+                        full_logits_buffer, num_full_logits = output_context, output_context.size(1)
                 else:
-                    output_context = F.log_softmax(output, 2)
                     indices = torch.unsqueeze(new_tokens, 1).unsqueeze(2)
-                    new_output_logits = torch.gather(output_context, 2, indices).squeeze(2)
+                    if all_probs:
+                        output_context = F.log_softmax(output, 2)
+                        new_output_logits = torch.gather(output_context, 2, indices).squeeze(2)
+                    else:
+                        new_output_logits = _gathered_log_softmax(output, indices)
 
-                    # TODO(rprenger) we're copying output_logits every time.  Should pre-allocate
-                    output_logits = torch.cat([output_logits, new_output_logits], 1)
+                    logits_buffer, num_logits = _append_columns(logits_buffer, num_logits, new_output_logits)
                     if all_probs:
-                        full_logits = torch.cat([full_logits, output_context], 1)
+                        full_logits_buffer, num_full_logits = _append_columns(
+                            full_logits_buffer, num_full_logits, output_context, grow_by=_FULL_LOGITS_GROWTH
+                        )
+                output_logits = logits_buffer[:, :num_logits]
+                if all_probs:
+                    full_logits = full_logits_buffer[:, :num_full_logits]
 
                 src = parallel_state.get_pipeline_model_parallel_last_rank()
                 group = parallel_state.get_embedding_group()
@@ -19,6 +19,7 @@ import shutil
 import tempfile
 import time
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Callable, Dict, Generator, Iterator, List, Literal, Mapping, Optional, Sized, Union
@@ -1136,34 +1137,32 @@ class NLPSaveRestoreConnector(SaveRestoreConnector):
                 with tempfile.TemporaryDirectory() as tmpdir:
                     if dist_ckpt:
                         shutil.move(str(dist_ckpt_dir), tmpdir)
-                    elif app_state.pipeline_model_parallel_size == 1:
-                        # move weights to the tmpdir
-                        for tp_rank in range(app_state.tensor_model_parallel_size):
-                            os.makedirs(os.path.join(tmpdir, f'mp_rank_{tp_rank:02d}'))
-                            mp_model_weights = os.path.join(
-                                dir_name, f'mp_rank_{tp_rank:02d}_' + self.model_weights_ckpt
-                            )
-                            shutil.move(
-                                mp_model_weights,
-                                os.path.join(tmpdir, f'mp_rank_{tp_rank:02d}', self.model_weights_ckpt),
-                            )
                     else:
-                        # move weights to the tmpdir
-                        for tp_rank, pp_rank in itertools.product(
-                            range(app_state.tensor_model_parallel_size),
-                            range(app_state.pipeline_model_parallel_size),
-                        ):
-                            os.makedirs(os.path.join(tmpdir, f'tp_rank_{tp_rank:02d}_pp_rank_{pp_rank:03d}'))
-                            mp_model_weights = os.path.join(
-                                dir_name, f'tp_rank_{tp_rank:02d}_pp_rank_{pp_rank:03d}_' + self.model_weights_ckpt
-                            )
+                        if app_state.pipeline_model_parallel_size == 1:
+                            rank_dirs = [
+                                f'mp_rank_{tp_rank:02d}' for tp_rank in range(app_state.tensor_model_parallel_size)
+                            ]
+                        else:
+                            rank_dirs = [
+                                f'tp_rank_{tp_rank:02d}_pp_rank_{pp_rank:03d}'
+                                for tp_rank, pp_rank in itertools.product(
+                                    range(app_state.tensor_model_parallel_size),
+                                    range(app_state.pipeline_model_parallel_size),
+                                )
+                            ]
+
+                        def move_rank_weights(rank_dir):
+                            os.makedirs(os.path.join(tmpdir, rank_dir))
                             shutil.move(
-                                mp_model_weights,
-                                os.path.join(
-                                    tmpdir, f'tp_rank_{tp_rank:02d}_pp_rank_{pp_rank:03d}', self.model_weights_ckpt
-                                ),
+                                os.path.join(dir_name, f'{rank_dir}_' + self.model_weights_ckpt),
+                                os.path.join(tmpdir, rank_dir, self.model_weights_ckpt),
                             )
 
+                        # move weights to the tmpdir, the per-rank files are independent and the moves are I/O bound
+                        # (a copy when tmpdir is on another filesystem), so they run in parallel
+                        with ThreadPoolExecutor(max_workers=min(len(rank_dirs), os.cpu_count() or 1)) as executor:
+                            list(executor.map(move_rank_weights, rank_dirs))
+
                     # create config and artifacts in tmpdir
                     config_yaml = os.path.join(tmpdir, self.model_config_yaml)
                     model.to_config_file(path2yaml_file=config_yaml)
@@ -161,7 +161,7 @@ def tokenize_dataset(cfg: 'DictConfig'):
                         # because input_ids are truncated by 1 for inputs and labels,
                         # we add 1 extra padding here to make sure padded inputs and labels
                         # are is a multiple of (cp_size * 2)
-                        val = val + [pad_id] * (max_length_to_pad - len(val) + 1)
+                        val = np.concatenate([val, [pad_id] * (max_length_to_pad - len(val) + 1)])
                         data[key] = val
                     elif len(val) > max_seq_length:
                         logging.info(
@@ -159,6 +159,15 @@ class TestSentencePieceTokenizer:
         assert tokens.count(tokenizer.token_to_id("<sep>")) == 0
         assert tokens.count(tokenizer.token_to_id("</s>")) == 0
 
+    @pytest.mark.unit
+    def test_text_to_ids_batch(self, test_data_dir):
+        tokenizer = SentencePieceTokenizer(test_data_dir + self.model_name)
+
+        texts = ["<cls> a b c", "", " e f g h i </s>"]
+        ids = tokenizer.text_to_ids_batch(texts)
+
+        assert ids == [tokenizer.text_to_ids(text) for text in texts]
+
     @pytest.mark.unit
     def test_ids_to_text(self, test_data_dir):
         tokenizer = SentencePieceTokenizer(test_data_dir + self.model_name)
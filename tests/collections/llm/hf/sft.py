@@ -108,9 +108,11 @@ def get_latest_checkpoint(base_dir):
 
     # Traverse through the base directory
     for root, dirs, _ in os.walk(base_dir):
+        checkpoint_dirs = []
         for dir_name in dirs:
             match = pattern.match(dir_name)
             if match:
+                checkpoint_dirs.append(dir_name)
                 loss, epoch, step = map(float, match.groups())  # Convert to float/int
                 epoch, step = int(epoch), int(step)
 
@@ -119,6 +121,8 @@ def get_latest_checkpoint(base_dir):
                     max_epoch = epoch
                     max_step = step
                     latest_checkpoint = os.path.join(root, dir_name)
+        # no need to walk the (many) files inside the checkpoints themselves
+        dirs[:] = [dir_name for dir_name in dirs if dir_name not in checkpoint_dirs]
 
     return Path(latest_checkpoint)
 
@@ -0,0 +1,204 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+import numpy as np
+import pytest
+import torch
+
+from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
+from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_dataset import GPTSFTDataset
+
+
+class CharTokenizer(TokenizerSpec):
+    """One token per character, ids shifted by `shift` so that two instances can map the same text differently."""
+
+    def __init__(self, shift=3):
+        self.shift = shift
+        self.vocab_size = 256
+        self.pad_id = 0
+        self.bos_id = 1
+        self.eos_id = 2
+        self.space_sensitive = True
+
+    def text_to_tokens(self, text):
+        return list(text)
+
+    def tokens_to_text(self, tokens):
+        return ''.join(tokens)
+
+    def tokens_to_ids(self, tokens):
+        return [(ord(t) + self.shift) % self.vocab_size for t in tokens]
+
+    def ids_to_tokens(self, ids):
+        return [chr((i - self.shift) % self.vocab_size) for i in ids]
+
+    def text_to_ids(self, text):
+        return self.tokens_to_ids(self.text_to_tokens(text))
+
+    def ids_to_text(self, ids):
+        return self.tokens_to_text(self.ids_to_tokens(ids))
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    with open(path, 'w') as f:
+        for i in range(6):
+            f.write(json.dumps({'input': f'question {i} ' * (i + 1), 'output': f'answer {i}'}) + '\n')
+    return str(path)
+
+
+def build_dataset(file_path, tmp_path, tokenizer=None, **kwargs):
+    dataset_kwargs = dict(
+        max_seq_length=40,
+        prompt_template='Q: {input}\nA: {output}',
+        truncation_field='input',
+        label_key='output',
+        add_bos=True,
+        add_eos=True,
+        index_mapping_dir=str(tmp_path),
+    )
+    dataset_kwargs.update(kwargs)
+    return GPTSFTDataset(file_path, tokenizer or CharTokenizer(), **dataset_kwargs)
+
+
+def assert_examples_equal(example, expected):
+    assert example.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(example[key], value)
+        else:
+            assert example[key] == value, key
+
+
+class TestGPTSFTDatasetPretokenize:
+    @pytest.mark.unit
+    def test_pretokenize_matches_tokenize(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path)
+        pretokenized = build_dataset(jsonl_file, tmp_path, pretokenize=True)
+
+        assert len(dataset) == len(pretokenized)
+        for idx in range(len(dataset)):
+            assert_examples_equal(pretokenized[idx], dataset[idx])
+        for example, expected in zip(pretokenized.__getitems__([5, 0, 3]), dataset.__getitems__([5, 0, 3])):
+            assert_examples_equal(example, expected)
+
+    @pytest.mark.unit
+    def test_cache_is_keyed_by_tokenizer(self, jsonl_file, tmp_path):
+        # same class name and vocab size, different ids
+        dataset = build_dataset(jsonl_file, tmp_path, tokenizer=CharTokenizer(shift=3), pretokenize=True)
+        other = build_dataset(jsonl_file, tmp_path, tokenizer=CharTokenizer(shift=5), pretokenize=True)
+
+        assert dataset._pretokenized_cache_prefix() != other._pretokenized_cache_prefix()
+        assert_examples_equal(other[1], build_dataset(jsonl_file, tmp_path, tokenizer=CharTokenizer(shift=5))[1])
+
+    @pytest.mark.unit
+    def test_cache_is_keyed_by_data_file(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path, pretokenize=True)
+        cache_prefix = dataset._pretokenized_cache_prefix()
+
+        with open(jsonl_file, 'a') as f:
+            f.write(json.dumps({'input': 'new question', 'output': 'new answer'}) + '\n')
+
+        assert dataset._pretokenized_cache_prefix() != cache_prefix
+
+
+class TestGPTSFTDatasetGetItems:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("output_original_text", [False, True])
+    def test_getitems_matches_getitem(self, jsonl_file, tmp_path, output_original_text):
+        dataset = build_dataset(jsonl_file, tmp_path, output_original_text=output_original_text)
+
+        indices = [5, 0, 3, 3, 1]
+        for example, idx in zip(dataset.__getitems__(indices), indices):
+            assert_examples_equal(example, dataset[idx])
+
+    @pytest.mark.unit
+    def test_example_layout(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path)
+        tokenizer = CharTokenizer()
+
+        example = dataset[0]
+        context_ids = [tokenizer.bos_id] + tokenizer.text_to_ids('Q: question 0\nA:')
+        answer_ids = tokenizer.text_to_ids(' answer 0')
+        np.testing.assert_array_equal(example['input_ids'], context_ids + answer_ids + [tokenizer.eos_id])
+        np.testing.assert_array_equal(example['context_ids'], context_ids)
+        np.testing.assert_array_equal(example['answer_ids'], answer_ids)
+        assert example['answer_start_idx'] == example['context_length'] == len(context_ids)
+        assert example['token_count'] == len(context_ids) + len(answer_ids) + 1
+
+    @pytest.mark.unit
+    def test_truncation_field_is_truncated(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path)
+        tokenizer = CharTokenizer()
+
+        example = dataset[5]
+        assert example['token_count'] == dataset.max_seq_length
+        np.testing.assert_array_equal(example['answer_ids'], tokenizer.text_to_ids(' answer 5'))
+        assert tokenizer.ids_to_text(example['context_ids'][1:]) == 'Q: question 5 question 5 q\nA:'
+
+
+class TestGPTSFTDatasetCollate:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("answer_only_loss", [True, False])
+    def test_shifts_and_loss_mask(self, jsonl_file, tmp_path, answer_only_loss):
+        dataset = build_dataset(jsonl_file, tmp_path, max_seq_length=64, answer_only_loss=answer_only_loss)
+        batch = [dataset[0], dataset[1]]
+        collated = dataset.collate_fn(batch)
+
+        # the longest shifted sequence, 37 tokens, padded up to a multiple of pad_seq_length_to_mult
+        assert max(example['token_count'] for example in batch) - 1 == 37
+        max_length = 48
+        eos_id = dataset.tokenizer.eos_id
+        for key in ('tokens', 'labels', 'loss_mask', 'position_ids', 'contexts', 'answers'):
+            assert collated[key].shape == (len(batch), max_length), key
+        for row, example in enumerate(batch):
+            input_ids = torch.from_numpy(example['input_ids'])
+            length = len(input_ids) - 1
+            assert torch.equal(collated['tokens'][row, :length], input_ids[:-1])
+            assert torch.equal(collated['labels'][row, :length], input_ids[1:])
+            assert (collated['tokens'][row, length:] == eos_id).all()
+            assert (collated['labels'][row, length:] == eos_id).all()
+
+            expected_loss_mask = torch.zeros(max_length, dtype=torch.uint8)
+            loss_start = example['answer_start_idx'] - 1 if answer_only_loss else 0
+            expected_loss_mask[loss_start:length] = 1
+            assert torch.equal(collated['loss_mask'][row], expected_loss_mask)
+        assert collated['context_lengths'].tolist() == [example['context_length'] for example in batch]
+        assert collated['token_count'] == [example['token_count'] for example in batch]
+
+    @pytest.mark.unit
+    def test_attention_mask_and_position_ids(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path)
+        collated = dataset.collate_fn([dataset[0], dataset[5]])
+        max_length = dataset.max_seq_length
+
+        causal_mask = ~torch.tril(torch.ones(max_length, max_length, dtype=torch.bool))
+        assert collated['attention_mask'].shape == (2, 1, max_length, max_length)
+        assert (collated['attention_mask'] == causal_mask).all()
+        assert torch.equal(collated['position_ids'], torch.arange(max_length, dtype=torch.int32).repeat(2, 1))
+
+        # real tensors, which the DataLoader can pin and which do not alias the cached mask of the next batch
+        assert collated['attention_mask'].is_contiguous() and collated['position_ids'].is_contiguous()
+        next_collated = dataset.collate_fn([dataset[1], dataset[5]])
+        collated['attention_mask'][0, 0, 0, 1] = False
+        assert next_collated['attention_mask'][0, 0, 0, 1]
+        assert dataset.collate_fn([dataset[5]])['attention_mask'][0, 0, 0, 1]
+
+    @pytest.mark.unit
+    def test_attention_mask_from_fusion(self, jsonl_file, tmp_path):
+        dataset = build_dataset(jsonl_file, tmp_path, get_attention_mask_from_fusion=True)
+
+        assert 'attention_mask' not in dataset.collate_fn([dataset[0], dataset[1]])
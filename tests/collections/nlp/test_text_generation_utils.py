@@ -0,0 +1,157 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import socket
+
+import numpy as np
+import pytest
+import torch
+import torch.multiprocessing as mp
+import torch.nn.functional as F
+
+from nemo.collections.nlp.modules.common import text_generation_utils
+from nemo.collections.nlp.modules.common.text_generation_utils import (
+    _append_columns,
+    _gathered_log_softmax,
+    top_k_logits,
+)
+
+
+def reference_top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started=None):
+    """The per-row loop implementation that top_k_logits replaced."""
+    if top_k > 0:
+        indices_to_remove = logits < torch.topk(logits, top_k)[0][..., -1, None]
+        if started is not None:
+            for i in np.arange(indices_to_remove.size(0))[started.cpu().numpy()]:
+                logits[i, indices_to_remove[i]] = filter_value
+        else:
+            logits[indices_to_remove] = filter_value
+
+    if 0.0 < top_p < 1.0:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True, dim=-1)
+        cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        sorted_indices_to_remove = cumulative_probs > top_p
+        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
+        sorted_indices_to_remove[..., 0] = 0
+        rows = range(sorted_indices.size(0))
+        if started is not None:
+            rows = np.arange(sorted_indices.size(0))[started.cpu().numpy()]
+        for i in rows:
+            indices_to_remove = sorted_indices[i][sorted_indices_to_remove[i]]
+            logits[i, indices_to_remove] = filter_value
+
+    return logits
+
+
+class TestTopKLogits:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("top_k", [0, 1, 5])
+    @pytest.mark.parametrize("top_p", [0.0, 0.5, 0.9, 1.0])
+    @pytest.mark.parametrize("with_started", [False, True])
+    def test_matches_reference(self, top_k, top_p, with_started):
+        generator = torch.Generator().manual_seed(top_k * 100 + int(top_p * 10) + with_started)
+        logits = torch.randn(6, 50, generator=generator) * 3
+        started = torch.tensor([True, False, True, True, False, True]) if with_started else None
+
+        expected = reference_top_k_logits(logits.clone(), top_k=top_k, top_p=top_p, started=started)
+        filtered = top_k_logits(logits.clone(), top_k=top_k, top_p=top_p, started=started)
+
+        torch.testing.assert_close(filtered, expected, rtol=0, atol=0)
+
+
+class TestGatheredLogSoftmax:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("dtype", [torch.float32, torch.bfloat16, torch.float16])
+    @pytest.mark.parametrize("seq_len", [1, 7])
+    def test_matches_log_softmax(self, dtype, seq_len):
+        generator = torch.Generator().manual_seed(seq_len)
+        logits = (torch.randn(4, seq_len, 32000, generator=generator) * 4 + 20).to(dtype)
+        indices = torch.randint(0, 32000, (4, seq_len, 1), generator=generator)
+
+        expected = torch.gather(F.log_softmax(logits.float(), 2), 2, indices).squeeze(2)
+        log_probs = _gathered_log_softmax(logits, indices)
+
+        assert log_probs.dtype == dtype
+        # within half an ulp of the fp32 reference, i.e. no worse than rounding the reference to dtype
+        torch.testing.assert_close(log_probs.float(), expected, rtol=torch.finfo(dtype).eps / 2, atol=1e-5)
+
+
+class TestAppendColumns:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("grow_by", [0, 3])
+    def test_matches_concatenation(self, grow_by):
+        columns = [torch.randn(2, n, 5) for n in (4, 1, 1, 1, 1, 1)]
+        buffer, length = columns[0], columns[0].size(1)
+        reallocations = 0
+        for new_columns in columns[1:]:
+            data_ptr = buffer.data_ptr()
+            buffer, length = _append_columns(buffer, length, new_columns, grow_by=grow_by)
+            reallocations += buffer.data_ptr() != data_ptr
+
+        torch.testing.assert_close(buffer[:, :length], torch.cat(columns, 1), rtol=0, atol=0)
+        assert buffer.size(1) - length <= grow_by
+        assert reallocations == (5 if grow_by == 0 else 2)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def _send_receive_generate_info(rank, world_size, port, generate_info):
+    os.environ['MASTER_ADDR'] = 'localhost'
+    os.environ['MASTER_PORT'] = str(port)
+    torch.distributed.init_process_group('gloo', rank=rank, world_size=world_size)
+    # run the broadcasts on CPU over the default group, with rank 0 as the model parallel source
+    torch.cuda.current_device = lambda: 'cpu'
+    text_generation_utils.parallel_state.get_model_parallel_group = lambda: None
+    text_generation_utils.get_model_parallel_src_rank = lambda: 0
+    try:
+        if rank == 0:
+            text_generation_utils.send_generate_info(*generate_info)
+        else:
+            received = text_generation_utils.receive_generate_info()
+            context_tokens, context_lengths, *scalars, end_strings, random_seed = generate_info
+            assert torch.equal(received[0], context_lengths)
+            assert torch.equal(received[1], context_tokens)
+            assert list(received[2:11]) == scalars
+            assert received[11] == end_strings
+            assert received[12] == random_seed
+    finally:
+        torch.distributed.destroy_process_group()
+
+
+class TestGenerateInfoBroadcast:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("random_seed", [None, 1234])
+    def test_send_receive_round_trip(self, random_seed):
+        context_tokens = torch.tensor([[5, 6, 7, 2], [8, 9, 2, 2], [50000, 1, 2, 3]])
+        context_lengths = torch.tensor([3, 2, 4])
+        generate_info = (
+            context_tokens,
+            context_lengths,
+            30,  # tokens_to_generate
+            True,  # all_probs
+            False,  # compute_logprob
+            0.7,  # temperature
+            40,  # top_k
+            0.9,  # top_p
+            False,  # greedy
+            1.2,  # repetition_penalty
+            3,  # min_tokens_to_generate
+            ['<|endoftext|>', '<extra_id_1>', 'ü'],  # end_strings
+            random_seed,
+        )
+        mp.spawn(_send_receive_generate_info, args=(2, _free_port(), generate_info), nprocs=2)